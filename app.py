@@ -1,189 +1,60 @@
 import streamlit as st
-import requests
-import base64
 from streamlit_cropper import st_cropper
-from PIL import Image
-import io
-import os
-import boto3
 import pandas as pd
 import plotly.express as px
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib.units import inch
-from reportlab.pdfgen import canvas
-from reportlab.platypus import Table, TableStyle, Paragraph, Spacer, PageBreak, SimpleDocTemplate, Image as RLImage
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
-from reportlab.lib.enums import TA_CENTER, TA_LEFT
-from io import BytesIO
-import requests as req
 import asyncio
-import aiohttp
-
-SIMILARITY_SVC_URL = os.getenv("SIMILARITY_SEARCH_SVC")
-IMAGE_DOWNLOAD_SVC_URL = os.getenv("IMAGE_DOWNLOAD_SVC")
-API_KEY = os.getenv("API_KEY")
-CC_ANALYSIS_FILE_PATH = os.getenv("CC_ANALYSIS_FILE_PATH")
-DESIGN_CODE_DESC_PATH = os.getenv("DESIGN_CODE_DESC_PATH")
-
-# AWS credentials
-AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
-AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
-AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
-
-# Download CSV from S3 and convert to DataFrame
-def download_csv_from_s3(s3_path):
-    """Download CSV file from S3 and return as DataFrame"""
-    if not s3_path:
-        return None
-    
-    # Parse S3 path (format: s3://bucket/key)
-    if s3_path.startswith('s3://'):
-        s3_path = s3_path[5:]
-    parts = s3_path.split('/', 1)
-    bucket = parts[0]
-    key = parts[1] if len(parts) > 1 else ''
-    
-    # Create S3 client with credentials if provided, otherwise use default credential chain
-    if AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY:
-        s3_client = boto3.client(
-            's3',
-            aws_access_key_id=AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-            region_name=AWS_REGION
-        )
-    else:
-        s3_client = boto3.client('s3', region_name=AWS_REGION)
-    
-    obj = s3_client.get_object(Bucket=bucket, Key=key)
-    df = pd.read_csv(io.BytesIO(obj['Body'].read()))
-    return df
-
-# Async function to fetch a single image
-async def fetch_image_async(session, image_url, serial_no, headers):
-    """Fetch a single image asynchronously"""
-    try:
-        async with session.get(image_url, timeout=aiohttp.ClientTimeout(total=5), headers=headers) as response:
-            if response.status == 200:
-                content = await response.read()
-                # Open image and resize it
-                img = Image.open(BytesIO(content))
-                img.thumbnail((200, 200), Image.Resampling.LANCZOS)  # Resize to max 200x200
-                
-                # Convert resized PIL image to BytesIO
-                img_buffer = BytesIO()
-                img.save(img_buffer, format='PNG')
-                img_buffer.seek(0)
-                
-                # Create RLImage from BytesIO
-                mark_img = RLImage(img_buffer, width=0.8*inch, height=0.8*inch)
-                return (serial_no, mark_img)
-            else:
-                return (serial_no, f"[Error {response.status}]")
-    except asyncio.TimeoutError:
-        return (serial_no, "[Timeout]")
-    except Exception as e:
-        return (serial_no, "[Image unavailable]")
-
-# Async function to fetch all images concurrently
-async def fetch_all_images_async(filtered_marks):
-    """Fetch all images concurrently"""
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-        'Accept': 'image/webp,image/apng,image/svg+xml,image/*,*/*;q=0.8',
-    }
-    
-    async with aiohttp.ClientSession() as session:
-        tasks = []
-        for mark in filtered_marks:
-            serial_no = str(mark.get('serial_no', 'N/A'))
-            image_url = f"{IMAGE_DOWNLOAD_SVC_URL}/{mark.get('serial_no')}/large"
-            tasks.append(fetch_image_async(session, image_url, serial_no, headers))
-        
-        # Execute all tasks concurrently
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        return results
-
-# Function to generate PDF with cropped image and results table
-def generate_pdf_report(cropped_img, filtered_marks, search_type_used):
-    """Generate a PDF report with cropped image and table of candidates"""
-    pdf_buffer = BytesIO()
-    
-    try:
-        # Create PDF document
-        doc = SimpleDocTemplate(pdf_buffer, pagesize=letter, topMargin=0.5*inch, bottomMargin=0.5*inch)
-        elements = []
-        styles = getSampleStyleSheet()
-        
-        # Title style
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=16,
-            textColor=colors.HexColor('#1f78b4'),
-            spaceAfter=12,
-            alignment=TA_CENTER
-        )
-        
-        # Add title
-        title = Paragraph("Trademark/Logo Similarity Search Report", title_style)
-        elements.append(title)
-        elements.append(Spacer(1, 0.2*inch))
-        
-        # Add cropped image - convert PIL to BytesIO
-        elements.append(Paragraph("<b>Query Image (Cropped):</b>", styles['Heading2']))
-        cropped_buffer = BytesIO()
-        cropped_img.save(cropped_buffer, format='PNG')
-        cropped_buffer.seek(0)
-        img_for_pdf = RLImage(cropped_buffer, width=2*inch, height=2*inch)
-        elements.append(img_for_pdf)
-        elements.append(Spacer(1, 0.3*inch))
-        
-        # Add results section
-        if filtered_marks:
-            elements.append(Paragraph(f"<b>Found {len(filtered_marks)} Similar Marks:</b>", styles['Heading2']))
-            elements.append(Spacer(1, 0.2*inch))
-            
-            # Create table data
-            table_data = [['Serial No.', 'Trademark Image']]
-            
-            # Fetch all images concurrently using async
-            image_results = asyncio.run(fetch_all_images_async(filtered_marks))
-            
-            # Process results and add to table
-            for serial_no, mark_img in image_results:
-                table_data.append([serial_no, mark_img])
-            
-            # Create table
-            table = Table(table_data, colWidths=[1.5*inch, 3*inch])
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1f78b4')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('ROWHEIGHTS', (0, 0), (-1, -1), 1*inch),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ]))
-            
-            elements.append(table)
-        else:
-            elements.append(Paragraph("No results to display.", styles['Normal']))
-        
-        # Build PDF
-        doc.build(elements)
-        pdf_buffer.seek(0)
-        return pdf_buffer
-        
-    except Exception as e:
-        return BytesIO()
-
+import functools
+import hashlib
+import io
+import os
+import time
+import uuid
+from PIL import Image
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from cache_backend import get_cache_backend
+from query_cache import NearDuplicateQueryCache
+from search_jobs import submit_search_job
+from session_store import SessionArtifactStore, format_bytes, process_memory_summary, redacted_session_stats
+from tm_core import (
+    CC_ANALYSIS_FILE_PATH,
+    DESIGN_CODE_DESC_PATH,
+    IMAGE_DOWNLOAD_SVC_URL,
+    ReportError,
+    aggregate_design_codes,
+    aggregate_word_mark_batch,
+    build_cooccurrence_matrix,
+    build_design_code_frame,
+    cached_search_result,
+    crop_image_bytes,
+    download_csv_from_s3,
+    extract_class_number,
+    filter_coordinated_classes,
+    filter_marks_by_design_code_selection,
+    generate_pdf_report,
+    image_search_cache_key,
+    image_to_png_bytes,
+    load_word_mark_batch_csv,
+    make_preview,
+    map_box_to_original,
+    run_word_mark_batch_async,
+    search_by_description,
+    search_by_image,
+    search_word_mark,
+)
+from watchlist import WatchlistStore, describe_saved_search, generate_delta_report, run_saved_searches
 
 cc_analysis_df = download_csv_from_s3(CC_ANALYSIS_FILE_PATH) if CC_ANALYSIS_FILE_PATH else None
 design_code_desc_df = download_csv_from_s3(DESIGN_CODE_DESC_PATH) if DESIGN_CODE_DESC_PATH else None
+design_code_descriptions = (
+    dict(zip(design_code_desc_df['design_code'].astype(str), design_code_desc_df['design_code_description']))
+    if design_code_desc_df is not None else {}
+)
+
+# Background search polling interval and number of cards rendered while results stream in
+SEARCH_POLL_INTERVAL_SECONDS = float(os.getenv("SEARCH_POLL_INTERVAL_SECONDS", "1"))
+PROGRESSIVE_CARD_LIMIT = int(os.getenv("PROGRESSIVE_CARD_LIMIT", "30"))
+# Admin-only: list every live session's memory use (ids redacted) in the sidebar memory panel
+SHOW_SESSION_MEMORY_TABLE = os.getenv("SHOW_SESSION_MEMORY_TABLE", "").lower() in ("1", "true", "yes")
 
 st.set_page_config(page_title="Trademark Analysis", layout="wide")
 # Legal disclaimer
@@ -193,17 +64,392 @@ st.warning("⚠️ **Disclaimer**: This tool is for informational purposes only
 st.sidebar.title("🔧 Navigation")
 page = st.sidebar.selectbox(
     "Choose a tool:",
-    ["Logo Similarity", "Word Mark Similarity", "Coordinate Class Calculator"],
+    ["Logo Similarity", "Word Mark Similarity", "Coordinate Class Calculator", "Watchlists"],
     key="nav_selectbox"
 )
 
+# Per-session store for large artifacts (raw results, PDFs) with a memory budget and temp-file spill
+if 'artifact_store' not in st.session_state:
+    ctx = get_script_run_ctx()
+    st.session_state.artifact_store = SessionArtifactStore(ctx.session_id if ctx else str(uuid.uuid4()))
+artifacts = st.session_state.artifact_store
+memory_panel = st.sidebar.expander("💾 Session Memory")
+
+
+def clear_design_code_keys():
+    """Drop the design-code filter widget keys left over from previous results"""
+    for key in [k for k in st.session_state.keys() if k.startswith("dc_")]:
+        del st.session_state[key]
+
+
+def design_code_label(code, count):
+    """Design code (category/division/code) label with its truncated description and mark count"""
+    description = design_code_descriptions.get(code)
+    if not description:
+        return f"{code} ({count})"
+    # Truncate description to ~30 chars for label
+    truncated_desc = description[:30] + "..." if len(description) > 30 else description
+    return f"{code} {truncated_desc} ({count})"
+
+
+def store_search_results(result, search_type_used=None, search_query=None):
+    """Replace the logo search results, discarding the previous results' PDF and filter state
+
+    search_query records what was searched ({"kind", "params", ...}) so the results can be saved as a watchlist.
+    """
+    clear_design_code_keys()
+    artifacts.discard("cached_pdf")
+    st.session_state.cached_pdf_marks = None
+    if result is None:
+        artifacts.discard("search_results")
+    else:
+        artifacts.put_json("search_results", result)
+    st.session_state.search_type_used = search_type_used
+    st.session_state.search_query = search_query
+
+
+def upload_preview(upload_bytes, upload_hash):
+    """Bounded-size preview of the upload, kept as PNG bytes in the artifact store and re-made if evicted"""
+    data = artifacts.get("upload_preview") if st.session_state.get("upload_hash") == upload_hash else None
+    if data is None:
+        preview, st.session_state.upload_size = make_preview(upload_bytes)
+        data = image_to_png_bytes(preview)
+        artifacts.put("upload_preview", data)
+        st.session_state.upload_hash = upload_hash
+    return Image.open(io.BytesIO(data))
+
+
+def full_resolution_crop_png(crop_box):
+    """PNG of the original upload cropped to crop_box, made only when needed and kept in the artifact store until the box changes"""
+    cache_key = (st.session_state.upload_hash, crop_box)
+    data = artifacts.get("full_crop") if st.session_state.get("full_crop_key") == cache_key else None
+    if data is None:
+        data = image_to_png_bytes(crop_image_bytes(st.session_state.image_uploader.getvalue(), crop_box))
+        artifacts.put("full_crop", data)
+        st.session_state.full_crop_key = cache_key
+    return data
+
+
+@st.cache_resource
+def get_query_cache():
+    """Process-wide near-duplicate cache for image searches"""
+    return NearDuplicateQueryCache()
+
+
+query_cache = get_query_cache()
+
+
+def search_image_and_remember(image_bytes, preview_crop, crop_box, upload_hash, similarity_type, on_marks=None, cancel_event=None):
+    """Image search remembered in the near-duplicate cache by crop box and shared-cache key (not the result itself)"""
+    result = search_by_image(image_bytes, similarity_type, on_marks=on_marks, cancel_event=cancel_event)
+    query_cache.store(preview_crop, upload_hash, similarity_type,
+                      (crop_box, similarity_type, image_search_cache_key(image_bytes, similarity_type)))
+    return result
+
+
+def start_search_job(search_fn, label, search_type_used, search_query=None):
+    """Run search_fn in the background, superseding (cancelling) any search still running in this session"""
+    previous_job = st.session_state.get("search_job")
+    if previous_job is not None:
+        previous_job.cancel()
+    store_search_results(None, search_type_used)
+    st.session_state.search_job = submit_search_job(search_fn, label, search_type_used)
+    st.session_state.search_job_query = search_query
+
+
+def start_image_search(crop_box, preview_crop, similarity_type, label, reuse=True):
+    """Reuse results of a near-identical earlier crop (matched on the preview crop), otherwise search in the background"""
+    search_query = {
+        "kind": "image",
+        "params": {"similarity_type": similarity_type},
+        "upload_hash": st.session_state.upload_hash,
+        "crop_box": crop_box,
+    }
+    cached = query_cache.lookup(preview_crop, st.session_state.upload_hash, similarity_type) if reuse else None
+    result = None
+    if cached is not None:
+        cached_crop_box, _, cache_key = cached
+        # The result itself lives in the shared cache; if it has been evicted since, search again
+        result = cached_search_result(cache_key)
+    if result is not None:
+        previous_job = st.session_state.get("search_job")
+        if previous_job is not None:
+            previous_job.cancel()
+        # Results of a different (if near-identical) crop must not seed a watchlist for this one
+        store_search_results(result, "Image (Upload Image)", {**search_query, "reused": cached_crop_box != crop_box})
+        st.success("Reused results from a near-identical earlier crop of this image.")
+        return
+    image_bytes = full_resolution_crop_png(crop_box)
+    start_search_job(
+        functools.partial(search_image_and_remember, image_bytes, preview_crop, crop_box, st.session_state.upload_hash, similarity_type),
+        label,
+        "Image (Upload Image)",
+        search_query
+    )
+
+
+def collect_search_job():
+    """Move a finished background search into the session's results"""
+    job = st.session_state.get("search_job")
+    if job is None:
+        return
+    status, _, result, error = job.snapshot()
+    if status == "running":
+        return
+    st.session_state.search_job = None
+    if status == "done":
+        store_search_results(result, job.search_type_used, st.session_state.get("search_job_query"))
+        st.session_state.search_job_message = ("success", "Search completed successfully!")
+    elif status == "failed":
+        store_search_results(None, job.search_type_used)
+        st.session_state.search_job_message = ("error", f"An error occurred: {error}")
+    else:
+        st.session_state.search_job_message = ("warning", "Search cancelled.")
+
+
+def render_mark_cards(marks):
+    """Render marks as cards, 3 per row"""
+    # Create columns for cards layout
+    cols = st.columns(3)  # 3 cards per row
+    
+    for idx, mark in enumerate(marks):
+        col = cols[idx % 3]
+        
+        with col:
+            with st.container():
+                st.markdown("---")
+                # Trademark image from USPTO
+                image_url = f"{IMAGE_DOWNLOAD_SVC_URL}/{mark.get('serial_no')}/large"
+            
+                # Create a fixed height container for the image
+                st.markdown(f"""
+                <div style="height: 150px; display: flex; align-items: center; justify-content: center; overflow: hidden;">
+                    <img src="{image_url}" style="max-width: 180px; max-height: 150px; object-fit: contain;" />
+                </div>
+                """, unsafe_allow_html=True)
+                
+                # Mark details
+                serial_no = mark.get('serial_no', 'N/A')
+                st.markdown(f"**Serial No:** [{serial_no}](https://tsdr.uspto.gov/#caseNumber={serial_no}&caseSearchType=US_APPLICATION&caseType=DEFAULT&searchType=statusSearch)")
+                st.write(f"**Filing Date:** {mark.get('filing_dt', 'N/A')}")
+                st.write(f"**Mark ID:** {mark.get('mark_id_char', 'N/A') or 'N/A'}")
+                st.write(f"**Similarity Score:** {mark.get('similarity_score', 0):.4f}")
+
+
+@st.fragment(run_every=SEARCH_POLL_INTERVAL_SECONDS)
+def render_running_search():
+    """Poll the background search, showing the best marks received so far until it finishes"""
+    job = st.session_state.get("search_job")
+    if job is None:
+        return
+    status, marks, _, _ = job.snapshot()
+    if status != "running":
+        st.rerun()  # Full rerun collects the result and renders the complete view
+    
+    st.info(f"{job.label} {len(marks)} marks received ({time.time() - job.started_at:.0f}s)")
+    st.button("✖ Cancel search", key="cancel_search_button", on_click=job.cancel)
+    if marks:
+        ranked_marks = sorted(marks, key=lambda mark: mark.get('similarity_score', 0), reverse=True)
+        st.write(f"Showing top {min(len(ranked_marks), PROGRESSIVE_CARD_LIMIT)} of {len(ranked_marks)} marks received so far")
+        render_mark_cards(ranked_marks[:PROGRESSIVE_CARD_LIMIT])
+
+
+def start_word_mark_search(word_mark, gs_description, nice_class):
+    """Search word marks in the background, superseding (cancelling) a word-mark search still running"""
+    previous_job = st.session_state.get("word_mark_job")
+    if previous_job is not None:
+        previous_job.cancel()
+    artifacts.discard("word_mark_results")
+    st.session_state.word_mark_job = submit_search_job(
+        # nice_class is only sent if provided
+        functools.partial(search_word_mark, word_mark, gs_description, nice_class),
+        "Searching for similar word marks...",
+        None
+    )
+    st.session_state.word_mark_job_query = {"word_mark": word_mark, "gs_description": gs_description, "nice_class": nice_class}
+
+
+def collect_word_mark_job():
+    """Move a finished background word-mark search into the session's results"""
+    job = st.session_state.get("word_mark_job")
+    if job is None:
+        return
+    status, _, results, error = job.snapshot()
+    if status == "running":
+        return
+    st.session_state.word_mark_job = None
+    if status == "done" and results:
+        artifacts.put_json("word_mark_results", results)
+        st.session_state.word_mark_query = st.session_state.word_mark_job_query
+        st.session_state.word_mark_job_message = ("success", f"Found {len(results)} similar word marks!")
+    elif status == "done":
+        st.session_state.word_mark_job_message = ("info", "No similar word marks found.")
+    elif status == "failed":
+        st.session_state.word_mark_job_message = ("error", f"An error occurred: {error}")
+    else:
+        st.session_state.word_mark_job_message = ("warning", "Search cancelled.")
+
+
+@st.fragment(run_every=SEARCH_POLL_INTERVAL_SECONDS)
+def render_running_word_mark_search():
+    """Poll the background word-mark search until it finishes"""
+    job = st.session_state.get("word_mark_job")
+    if job is None:
+        return
+    status, marks, _, _ = job.snapshot()
+    if status != "running":
+        st.rerun()  # Full rerun collects the results and renders the analysis
+    
+    st.info(f"{job.label} {len(marks)} marks received ({time.time() - job.started_at:.0f}s)")
+    st.button("✖ Cancel search", key="cancel_word_mark_search_button", on_click=job.cancel)
+
+
+collect_search_job()
+collect_word_mark_job()
+
+
+def store_dataframe(key, df):
+    """Store a DataFrame in the session artifact store"""
+    artifacts.put(key, df.to_json(orient="split").encode("utf-8"))
+
+
+def load_dataframe(key):
+    """Load a DataFrame from the session artifact store (None if missing or evicted)"""
+    data = artifacts.get(key)
+    if data is None:
+        return None
+    return pd.read_json(io.StringIO(data.decode("utf-8")), orient="split", dtype=False, convert_dates=False)
+
+
+@st.cache_resource
+def get_watchlist_store():
+    """Process-wide watchlist store (the same SQLite file the CLI runs against)"""
+    return WatchlistStore()
+
+
+watchlist_store = get_watchlist_store()
+
+
+def render_save_watchlist(kind, params, marks, key, image_bytes_fn=None):
+    """Save the current search as a watchlist; the marks already shown become its first snapshot"""
+    with st.expander("👁 Save as watchlist"):
+        name = st.text_input("Watchlist name:", key=f"{key}_name").strip()
+        interval_days = st.number_input("Re-run every (days):", min_value=1, value=7, key=f"{key}_interval")
+        if st.button("Save watchlist", key=f"{key}_button"):
+            if not name:
+                st.warning("Please enter a name for the watchlist.")
+            elif watchlist_store.get_saved_search(name) is not None:
+                st.warning(f"A watchlist named '{name}' already exists.")
+            else:
+                watchlist_store.add_saved_search(
+                    name, kind, params,
+                    image_bytes=image_bytes_fn() if image_bytes_fn else None,
+                    interval_days=interval_days,
+                    initial_marks=marks
+                )
+                st.success(f"Saved '{name}'. Re-runs will report only new and changed marks.")
+
+
+def run_watchlists(artifact_store, names, on_marks=None, cancel_event=None):
+    """Background job body: re-run saved searches, reporting each one's summary through on_marks as it finishes
+
+    A summary carries the run's delta; a PDF of its new and changed marks goes into the artifact store.
+    """
+    summaries = []
+
+    def on_outcome(outcome):
+        name = outcome["search"]["name"]
+        delta = outcome["delta"]
+        report_error = None
+        if delta and (delta["new"] or delta["changed"]):
+            try:
+                artifact_store.put(f"watchlist_pdf_{name}", generate_delta_report(outcome).getvalue())
+            except ReportError as e:
+                report_error = str(e)
+        summary = {
+            "name": name,
+            "description": describe_saved_search(outcome["search"]),
+            "kind": outcome["search"]["kind"],
+            "delta": delta,
+            "total": outcome["total"],
+            "error": outcome["error"],
+            "report_error": report_error,
+        }
+        summaries.append(summary)
+        on_marks([summary])
+
+    run_saved_searches(watchlist_store, names, on_outcome=on_outcome, cancel_event=cancel_event)
+    return summaries
+
+
+def start_watchlist_run(names):
+    """Re-run saved searches in the background, superseding a run still in progress"""
+    previous_job = st.session_state.get("watchlist_job")
+    if previous_job is not None:
+        previous_job.cancel()
+    artifacts.discard("watchlist_outcomes")
+    for name in names:
+        artifacts.discard(f"watchlist_pdf_{name}")
+    st.session_state.watchlist_job = submit_search_job(
+        functools.partial(run_watchlists, artifacts, names),
+        f"Re-running {len(names)} saved searches...",
+        None
+    )
+    st.session_state.watchlist_job_total = len(names)
+
+
+def collect_watchlist_job():
+    """Keep the summaries of a finished (or cancelled) watchlist run; searches that finished have new snapshots either way"""
+    job = st.session_state.get("watchlist_job")
+    if job is None:
+        return
+    status, summaries, _, error = job.snapshot()
+    if status == "running":
+        return
+    st.session_state.watchlist_job = None
+    artifacts.put_json("watchlist_outcomes", summaries)
+    if status == "failed":
+        st.session_state.watchlist_job_message = ("error", f"An error occurred: {error}")
+    elif status == "cancelled":
+        st.session_state.watchlist_job_message = (
+            "warning", f"Run cancelled after {len(summaries)} of {st.session_state.watchlist_job_total} saved searches."
+        )
+
+
+@st.fragment(run_every=SEARCH_POLL_INTERVAL_SECONDS)
+def render_running_watchlists():
+    """Poll the background watchlist run, listing each saved search as it finishes"""
+    job = st.session_state.get("watchlist_job")
+    if job is None:
+        return
+    status, summaries, _, _ = job.snapshot()
+    if status != "running":
+        st.rerun()  # Full rerun collects the summaries and refreshes the saved search table
+    
+    total = st.session_state.watchlist_job_total
+    st.progress(len(summaries) / total if total else 1.0,
+                text=f"{job.label} {len(summaries)} of {total} done ({time.time() - job.started_at:.0f}s)")
+    for summary in summaries:
+        if summary["error"]:
+            st.write(f"❌ **{summary['name']}**: {summary['error']}")
+        else:
+            st.write(f"✔ **{summary['name']}**: {len(summary['delta']['new'])} new, {len(summary['delta']['changed'])} changed")
+    st.button("✖ Cancel run", key="cancel_watchlist_run_button", on_click=job.cancel)
+
+
+def delete_watchlists(names):
+    """Remove saved searches and their last run's report"""
+    for name in names:
+        watchlist_store.delete_saved_search(name)
+        artifacts.discard(f"watchlist_pdf_{name}")
+    st.session_state.watchlist_selection = []
+
+
 # ===== LOGO SIMILARITY PAGE =====
 if page == "Logo Similarity":
     st.title("Trademark/Logo Similarity Search (USPTO Trademarks only)")
     
-    # Initialize session state for search results
-    if 'search_results' not in st.session_state:
-        st.session_state.search_results = None
+    # Initialize session state for search results (the results themselves live in the artifact store)
     if 'search_type_used' not in st.session_state:
         st.session_state.search_type_used = None
     
@@ -218,10 +464,10 @@ if page == "Logo Similarity":
     
     # Clear results if search type changes
     if st.session_state.search_type_used and st.session_state.search_type_used != search_type:
-        st.session_state.search_results = None
-        st.session_state.search_type_used = None
+        store_search_results(None)
 
-    cropped_img = None
+    crop_box = None
+    preview_crop = None
     description_text = ""
     gs_desc = ""  # Initialize for use in both search types
 
@@ -234,20 +480,26 @@ if page == "Logo Similarity":
         )
         
         if uploaded_file is not None:
-            # Display and crop the image
-            img = Image.open(uploaded_file)
+            # Decode the upload once per file (keyed by content hash) into a bounded-size preview proxy
+            upload_bytes = uploaded_file.getvalue()
+            preview_img = upload_preview(upload_bytes, hashlib.sha256(upload_bytes).hexdigest())
             
             # Create two columns for cropper and preview
             crop_col, preview_col = st.columns([2, 1])
             
             with crop_col:
                 st.write("### Original Image:")
-                cropped_img = st_cropper(img, realtime_update=True, box_color='#FF0004')
+                box = st_cropper(preview_img, realtime_update=True, box_color='#FF0004', return_type='box')
+            
+            # The box is in preview pixels; it is mapped onto the original only when a crop is needed
+            if box is not None:
+                crop_box = map_box_to_original(box, preview_img.size, st.session_state.upload_size)
             
             with preview_col:
                 st.write("### Selected Image Preview")
-                if cropped_img is not None:
-                    st.image(cropped_img, use_container_width=True)
+                if box is not None:
+                    preview_crop = preview_img.crop((box["left"], box["top"], box["left"] + box["width"], box["top"] + box["height"]))
+                    st.image(preview_crop, use_container_width=True)
 
     else:  # Describe Image
         description_text = st.text_area(
@@ -287,196 +539,143 @@ if page == "Logo Similarity":
             )
         
         # Handle shape similarity search
-        if shape_search_button and cropped_img is not None:
-            with st.spinner("Searching for similar marks by shape..."):
-                try:
-                    # Convert cropped image to bytes for upload
-                    img_byte_arr = io.BytesIO()
-                    cropped_img.save(img_byte_arr, format='PNG')    
-                    img_byte_arr.seek(0)
-                    
-                    # Prepare the POST request
-                    files = {"image": ("cropped_image.png", img_byte_arr, "image/png")}
-                    data = {"similarity_type": "shape_similarity"}
-                    headers = {"x-api-key": API_KEY} if API_KEY else {}
-                    response = requests.post(
-                        f"{SIMILARITY_SVC_URL}/similarMarksByImage",
-                        files=files,
-                        data=data,
-                        headers=headers
-                    )
-                    
-                    if response.status_code == 200:
-                        st.success("Search completed successfully!")
-                        result = response.json()
-                        st.session_state.search_results = result
-                        st.session_state.search_type_used = "Image (Upload Image)"
-                    else:
-                        st.error(f"Error: {response.status_code}")
-                        st.session_state.search_results = None
-                        
-                except Exception as e:
-                    st.error(f"An error occurred: {str(e)}")
+        if shape_search_button and crop_box is not None:
+            try:
+                start_image_search(crop_box, preview_crop, "shape_similarity", "Searching for similar marks by shape...")
+            except Exception as e:
+                st.error(f"An error occurred: {str(e)}")
         
-        elif shape_search_button and cropped_img is None:
+        elif shape_search_button and crop_box is None:
             st.warning("Please upload an image file and crop it first.")
         
         # Handle concept similarity search
-        if concept_search_button and cropped_img is not None:
-            with st.spinner("Searching for similar marks by concept..."):
-                try:
-                    # Convert cropped image to bytes for upload
-                    img_byte_arr = io.BytesIO()
-                    cropped_img.save(img_byte_arr, format='PNG')    
-                    img_byte_arr.seek(0)
-                    
-                    # Prepare the POST request
-                    files = {"image": ("cropped_image.png", img_byte_arr, "image/png")}
-                    data = {"similarity_type": "concept_similarity"}
-                    headers = {"x-api-key": API_KEY} if API_KEY else {}
-                    response = requests.post(
-                        f"{SIMILARITY_SVC_URL}/similarMarksByImage",
-                        files=files,
-                        data=data,
-                        headers=headers
-                    )
-                    
-                    if response.status_code == 200:
-                        st.success("Search completed successfully!")
-                        result = response.json()
-                        st.session_state.search_results = result
-                        st.session_state.search_type_used = "Image (Upload Image)"
-                    else:
-                        st.error(f"Error: {response.status_code}")
-                        st.session_state.search_results = None
-                        
-                except Exception as e:
-                    st.error(f"An error occurred: {str(e)}")
+        if concept_search_button and crop_box is not None:
+            try:
+                start_image_search(crop_box, preview_crop, "concept_similarity", "Searching for similar marks by concept...")
+            except Exception as e:
+                st.error(f"An error occurred: {str(e)}")
         
-        elif concept_search_button and cropped_img is None:
+        elif concept_search_button and crop_box is None:
             st.warning("Please upload an image file and crop it first.")
+        
+        query_cache_stats = query_cache.stats()
+        if query_cache_stats["hits"] + query_cache_stats["misses"]:
+            st.caption(f"Near-duplicate crop cache: {query_cache_stats['hit_rate']:.0%} hit rate "
+                       f"({query_cache_stats['hits']} of {query_cache_stats['hits'] + query_cache_stats['misses']} image searches)")
 
     # Search button for description-based search
     elif search_type == "Image Description":
         if st.button("Search Similar Marks", key="search_button"):
             if description_text.strip():
-                with st.spinner("Searching for similar marks..."):
-                    try:
-                        # Prepare the POST request for description with goods/services description
-                        data = {"description": description_text.strip()}
-                        if gs_desc.strip():
-                            data["gs_desc"] = gs_desc.strip()
-                        headers = {"x-api-key": API_KEY} if API_KEY else {}
-                        response = requests.post(
-                            f"{SIMILARITY_SVC_URL}/similarMarksByDescription",
-                            data=data,
-                            headers=headers
-                        )
-                        
-                        if response.status_code == 200:
-                            st.success("Search completed successfully!")
-                            result = response.json()
-                            st.session_state.search_results = result
-                            st.session_state.search_type_used = "Image Description"
-                        else:
-                            st.error(f"Error: {response.status_code} - {response.text}")
-                            st.session_state.search_results = None
-                            
-                    except Exception as e:
-                        st.error(f"An error occurred: {str(e)}")
+                # Description search with optional goods/services description
+                start_search_job(
+                    functools.partial(search_by_description, description_text, gs_desc),
+                    "Searching for similar marks...",
+                    "Image Description",
+                    {"kind": "description", "params": {"description": description_text, "gs_desc": gs_desc}}
+                )
             else:
                 st.warning("Please enter a description of the trademark image.")
     
     
+    # Outcome of the last background search, then progress of the running one (if any)
+    if 'search_job_message' in st.session_state:
+        message_type, message = st.session_state.pop('search_job_message')
+        getattr(st, message_type)(message)
+    if st.session_state.get("search_job") is not None:
+        render_running_search()
+    
     # Display results if they exist in session state (outside button block for dynamic filtering)
-    if st.session_state.search_results is not None:
-        result = st.session_state.search_results
+    result = artifacts.get_json("search_results")
+    if result is not None:
         
         if "similar_marks" in result and result["similar_marks"]:
             st.subheader(f"Found {len(result['similar_marks'])} similar marks")
             
-            # Aggregate design codes from all similar marks and count occurrences
-            design_code_counts = {}
-            for mark in result["similar_marks"]:
-                mark_design_codes = mark.get("design_codes", [])
-                if mark_design_codes:
-                    for code in mark_design_codes:
-                        design_code_counts[code] = design_code_counts.get(code, 0) + 1
+            search_query = st.session_state.get("search_query")
+            if search_query is not None:
+                if search_query.get("reused"):
+                    st.caption("These results were reused from a near-identical earlier crop. Search this exact crop to save it as a watchlist.")
+                    if st.button("🔄 Search this exact crop", key="exact_crop_search_button") and crop_box is not None:
+                        start_image_search(crop_box, preview_crop, search_query["params"]["similarity_type"],
+                                           "Searching for similar marks...", reuse=False)
+                        st.rerun()
+                elif search_query["kind"] != "image":
+                    render_save_watchlist(search_query["kind"], search_query["params"], result["similar_marks"], "logo_watchlist")
+                elif search_query["upload_hash"] == st.session_state.get("upload_hash"):
+                    render_save_watchlist(
+                        "image", search_query["params"], result["similar_marks"], "logo_watchlist",
+                        image_bytes_fn=lambda: full_resolution_crop_png(search_query["crop_box"])
+                    )
             
-            # Sort design codes by count (descending)
-            sorted_design_codes = sorted(design_code_counts.items(), key=lambda x: x[1], reverse=True)
+            # One vectorized pass: (mark, code) rows with category/division, then counts rolled up per level
+            code_frame = build_design_code_frame(result["similar_marks"])
+            design_code_counts = aggregate_design_codes(code_frame)
+            # Without any design codes there is nothing to filter on, so every mark is shown
+            filtered_marks = result["similar_marks"]
             
             # Create layout with main content and sidebar
             main_col, side_col = st.columns([3, 1])
             
             with side_col:
                 st.subheader("Design Codes")
-                if sorted_design_codes:
-                    st.write("*Click to filter results*")
+                if not code_frame.empty:
+                    st.write("*Select categories, then optionally narrow to divisions or codes*")
+                    
+                    filter_key_suffix = st.session_state.search_type_used.replace(" ", "_").replace("(", "").replace(")", "")
+                    category_key = f"dc_categories_{filter_key_suffix}"
+                    division_key = f"dc_divisions_{filter_key_suffix}"
+                    code_key = f"dc_codes_{filter_key_suffix}"
                     
-                    # Add Select All checkbox
-                    checkbox_key_suffix = st.session_state.search_type_used.replace(" ", "_").replace("(", "").replace(")", "")
-                    select_all_key = f"select_all_{checkbox_key_suffix}"
+                    category_counts = design_code_counts["category"]
+                    division_counts = design_code_counts["division"]
+                    code_counts = design_code_counts["code"]
                     
-                    # Initialize select_all state if not exists
-                    if select_all_key not in st.session_state:
-                        st.session_state[select_all_key] = True
+                    st.button("Reset filters", key="reset_design_code_filters", on_click=clear_design_code_keys)
                     
-                    select_all = st.checkbox(
-                        "**Select All / Deselect All**",
-                        value=st.session_state[select_all_key],
-                        key=select_all_key
+                    # Initialize with every category selected
+                    if category_key not in st.session_state:
+                        st.session_state[category_key] = list(category_counts.index)
+                    selected_categories = st.multiselect(
+                        "Categories",
+                        options=list(category_counts.index),
+                        format_func=lambda c: design_code_label(c, category_counts[c]),
+                        key=category_key
                     )
                     
-                    st.write("---")
+                    # Children are limited to the selected parents; drop stale selections before rendering
+                    division_options = [d for d in division_counts.index if d[:2] in selected_categories]
+                    st.session_state[division_key] = [d for d in st.session_state.get(division_key, []) if d in division_options]
+                    selected_divisions = st.multiselect(
+                        "Divisions (optional)",
+                        options=division_options,
+                        format_func=lambda d: design_code_label(d, division_counts[d]),
+                        key=division_key,
+                        placeholder="All divisions"
+                    )
                     
-                    # Create checkboxes for each design code
-                    selected_codes = []
-                    for code, count in sorted_design_codes:
-                        # Initialize individual checkbox state if not exists
-                        code_key = f"code_{code}_{checkbox_key_suffix}"
-                        if code_key not in st.session_state:
-                            st.session_state[code_key] = True
-                        
-                        # Sync with select_all if it just changed
-                        if select_all != st.session_state.get(f"{select_all_key}_prev", True):
-                            st.session_state[code_key] = select_all
-                        
-                        # Get description for the design code and truncate for display
-                        checkbox_label = f"{code} ({count})"
-                        help_text = code
-                        if design_code_desc_df is not None:
-                            desc_row = design_code_desc_df[design_code_desc_df['design_code'] == code]
-                            if not desc_row.empty:
-                                description = desc_row.iloc[0]['design_code_description']
-                                # Truncate description to ~30 chars for label
-                                truncated_desc = description[:30] + "..." if len(description) > 30 else description
-                                checkbox_label = f"{truncated_desc} ({count})"
-                                help_text = f"{code}: {description}"
-                        
-                        is_selected = st.checkbox(
-                            checkbox_label,
-                            value=st.session_state[code_key],
-                            key=code_key,
-                            help=help_text
-                        )
-                        if is_selected:
-                            selected_codes.append(code)
+                    code_parents = code_frame.drop_duplicates("code").set_index("code")
+                    code_options = [
+                        c for c in code_counts.index
+                        if code_parents.at[c, "category"] in selected_categories
+                        and (not selected_divisions or code_parents.at[c, "division"] in selected_divisions)
+                    ]
+                    st.session_state[code_key] = [c for c in st.session_state.get(code_key, []) if c in code_options]
+                    selected_codes = st.multiselect(
+                        "Design codes (optional)",
+                        options=code_options,
+                        format_func=lambda c: design_code_label(c, code_counts[c]),
+                        key=code_key,
+                        placeholder="All design codes"
+                    )
                     
-                    # Store the previous select_all state for next comparison
-                    st.session_state[f"{select_all_key}_prev"] = select_all
+                    # Filter marks based on the selected design code hierarchy
+                    filtered_marks = filter_marks_by_design_code_selection(
+                        result["similar_marks"], code_frame, selected_categories, selected_divisions, selected_codes
+                    )
                 else:
                     st.write("No design codes found")
             
-            # Filter marks based on selected design codes
-            if selected_codes:
-                filtered_marks = [
-                    mark for mark in result["similar_marks"]
-                    if any(code in mark.get("design_codes", []) for code in selected_codes)
-                ]
-            else:
-                filtered_marks = []
-            
             with main_col:
                 if filtered_marks:
                     st.write(f"Showing {len(filtered_marks)} of {len(result['similar_marks'])} marks")
@@ -484,54 +683,37 @@ if page == "Logo Similarity":
                     # Cache PDF generation by tracking filtered marks
                     if 'cached_pdf_marks' not in st.session_state:
                         st.session_state.cached_pdf_marks = None
-                        st.session_state.cached_pdf_data = None
                     
                     # Get hashable representation of current filtered marks
                     current_marks_hash = tuple(mark.get('serial_no') for mark in filtered_marks)
                     
-                    # Generate PDF only if filtered marks have changed
-                    if cropped_img is not None:
-                        if st.session_state.cached_pdf_marks != current_marks_hash:
-                            st.session_state.cached_pdf_data = generate_pdf_report(
-                                cropped_img, 
-                                filtered_marks, 
-                                st.session_state.search_type_used
-                            )
-                            st.session_state.cached_pdf_marks = current_marks_hash
+                    # Generate PDF only if filtered marks have changed (or the cached PDF was evicted)
+                    if crop_box is not None:
+                        pdf_data = artifacts.get("cached_pdf")
+                        if st.session_state.cached_pdf_marks != current_marks_hash or pdf_data is None:
+                            try:
+                                pdf_data = generate_pdf_report(
+                                    Image.open(io.BytesIO(full_resolution_crop_png(crop_box))), 
+                                    filtered_marks, 
+                                    st.session_state.search_type_used
+                                ).getvalue()
+                            except ReportError as e:
+                                st.error(str(e))
+                                pdf_data = None
+                            else:
+                                artifacts.put("cached_pdf", pdf_data)
+                                st.session_state.cached_pdf_marks = current_marks_hash
                         
-                        st.download_button(
-                            label="📥 Download Results as PDF",
-                            data=st.session_state.cached_pdf_data,
-                            file_name="trademark_similarity_results.pdf",
-                            mime="application/pdf",
-                            key="download_pdf_button"
-                        )
-                    
-                    # Create columns for cards layout
-                    cols = st.columns(3)  # 3 cards per row
+                        if pdf_data is not None:
+                            st.download_button(
+                                label="📥 Download Results as PDF",
+                                data=pdf_data,
+                                file_name="trademark_similarity_results.pdf",
+                                mime="application/pdf",
+                                key="download_pdf_button"
+                            )
                     
-                    for idx, mark in enumerate(filtered_marks):
-                        col = cols[idx % 3]
-                        
-                        with col:
-                            with st.container():
-                                st.markdown("---")
-                                # Trademark image from USPTO
-                                image_url = f"{IMAGE_DOWNLOAD_SVC_URL}/{mark.get('serial_no')}/large"
-                            
-                                # Create a fixed height container for the image
-                                st.markdown(f"""
-                                <div style="height: 150px; display: flex; align-items: center; justify-content: center; overflow: hidden;">
-                                    <img src="{image_url}" style="max-width: 180px; max-height: 150px; object-fit: contain;" />
-                                </div>
-                                """, unsafe_allow_html=True)
-                                
-                                # Mark details
-                                serial_no = mark.get('serial_no', 'N/A')
-                                st.markdown(f"**Serial No:** [{serial_no}](https://tsdr.uspto.gov/#caseNumber={serial_no}&caseSearchType=US_APPLICATION&caseType=DEFAULT&searchType=statusSearch)")
-                                st.write(f"**Filing Date:** {mark.get('filing_dt', 'N/A')}")
-                                st.write(f"**Mark ID:** {mark.get('mark_id_char', 'N/A') or 'N/A'}")
-                                st.write(f"**Similarity Score:** {mark.get('similarity_score', 0):.4f}")
+                    render_mark_cards(filtered_marks)
                 else:
                     st.info("No marks match the selected design codes. Please select at least one design code.")
         else:
@@ -541,150 +723,257 @@ if page == "Logo Similarity":
 elif page == "Word Mark Similarity":
     st.title("Word Mark Similarity Search")
     
-    # Initialize session state for search results
-    if 'word_mark_results' not in st.session_state:
-        st.session_state.word_mark_results = None
+    # Search results live in the session artifact store
+
+    search_mode = st.radio(
+        "Search mode:",
+        ["Single Search", "Batch (CSV Upload)"],
+        key="word_mark_mode_radio",
+        horizontal=True
+    )
+
+    if search_mode == "Single Search":
+        # Input fields
+        st.subheader("Enter Search Parameters")
     
-    # Input fields
-    st.subheader("Enter Search Parameters")
+        query_word_mark = st.text_input(
+            "Query Word Mark:",
+            placeholder="Enter the word mark to search for (e.g., GOOGLE)",
+            key="query_word_mark_input"
+        )
     
-    query_word_mark = st.text_input(
-        "Query Word Mark:",
-        placeholder="Enter the word mark to search for (e.g., GOOGLE)",
-        key="query_word_mark_input"
-    )
+        gs_description = st.text_area(
+            "Goods and Services Description:",
+            placeholder="Describe the goods and services (eg. software for online search and advertising)",
+            height=100,
+            key="gs_description_input"
+        )
     
-    gs_description = st.text_area(
-        "Goods and Services Description:",
-        placeholder="Describe the goods and services (eg. software for online search and advertising)",
-        height=100,
-        key="gs_description_input"
-    )
+        nice_class = st.text_input(
+            "NICE Class (Optional):",
+            placeholder="Enter NICE class number (e.g., 25)",
+            key="nice_class_input"
+        )
     
-    nice_class = st.text_input(
-        "NICE Class (Optional):",
-        placeholder="Enter NICE class number (e.g., 25)",
-        key="nice_class_input"
-    )
+        # Search button
+        if st.button("Search", key="word_mark_search_button"):
+            if query_word_mark.strip() and gs_description.strip():
+                start_word_mark_search(query_word_mark, gs_description, nice_class)
+            else:
+                st.warning("Please enter both Query Word Mark and Goods and Services Description.")
     
-    # Search button
-    if st.button("Search", key="word_mark_search_button"):
-        if query_word_mark.strip() and gs_description.strip():
-            with st.spinner("Searching for similar word marks..."):
-                try:
-                    # Prepare request body
-                    body = {
-                        "word_mark": query_word_mark.strip(),
-                        "gs_description": gs_description.strip()
-                    }
-                    
-                    # Only include nice_class if provided
-                    if nice_class.strip():
-                        body["nice_class"] = nice_class.strip()
-                    
-                    # Make API call
-                    response = requests.post(
-                        f"{SIMILARITY_SVC_URL}/wmark-app/locCandidatesForWordMark",
-                        json=body
-                    )
-                    
-                    if response.status_code == 200:
-                        results = response.json()
-                        if results and len(results) > 0:
-                            st.success(f"Found {len(results)} similar word marks!")
-                            st.session_state.word_mark_results = results
-                        else:
-                            st.info("No similar word marks found.")
-                            st.session_state.word_mark_results = None
-                    else:
-                        st.error(f"Error: {response.status_code} - {response.text}")
-                        st.session_state.word_mark_results = None
-                        
-                except Exception as e:
-                    st.error(f"An error occurred: {str(e)}")
-                    st.session_state.word_mark_results = None
-        else:
-            st.warning("Please enter both Query Word Mark and Goods and Services Description.")
+        # Outcome of the last background search, then progress of the running one (if any)
+        if 'word_mark_job_message' in st.session_state:
+            message_type, message = st.session_state.pop('word_mark_job_message')
+            getattr(st, message_type)(message)
+        if st.session_state.get("word_mark_job") is not None:
+            render_running_word_mark_search()
     
-    # Display results if they exist
-    if st.session_state.word_mark_results is not None:
-        results = st.session_state.word_mark_results
+        # Display results if they exist
+        results = artifacts.get_json("word_mark_results")
+        if results is not None:
         
-        st.write("---")
-        st.subheader("Similarity Analysis")
+            st.write("---")
+            st.subheader("Similarity Analysis")
+            
+            if st.session_state.get("word_mark_query"):
+                render_save_watchlist("word_mark", st.session_state.word_mark_query, results, "word_mark_watchlist")
         
-        # Prepare data for scatter plot
-        df = pd.DataFrame(results)
+            # Prepare data for scatter plot
+            df = pd.DataFrame(results)
         
-        # Create hover text combining registration_no and mark_id_char
-        df['hover_text'] = df.apply(
-            lambda row: f"Registration No: {row['registration_no']}<br>Mark: {row['mark_id_char']}", 
-            axis=1
-        )
+            # Create hover text combining registration_no and mark_id_char
+            df['hover_text'] = df.apply(
+                lambda row: f"Registration No: {row['registration_no']}<br>Mark: {row['mark_id_char']}", 
+                axis=1
+            )
         
-        # Create scatter plot
-        fig = px.scatter(
-            df,
-            x='good_services_similarity_score',
-            y='word_similarity_score',
-            hover_data={'hover_text': True, 
-                       'good_services_similarity_score': False, 
-                       'word_similarity_score': False,
-                       'registration_no': False,
-                       'mark_id_char': False},
-            labels={
-                'good_services_similarity_score': 'Goods & Services Similarity Score',
-                'word_similarity_score': 'Word Similarity Score'
-            },
-            title='Word Mark Similarity Analysis',
-            color='word_similarity_score',
-            color_continuous_scale='Viridis',
-            size_max=10
-        )
+            # Create scatter plot
+            fig = px.scatter(
+                df,
+                x='good_services_similarity_score',
+                y='word_similarity_score',
+                hover_data={'hover_text': True, 
+                           'good_services_similarity_score': False, 
+                           'word_similarity_score': False,
+                           'registration_no': False,
+                           'mark_id_char': False},
+                labels={
+                    'good_services_similarity_score': 'Goods & Services Similarity Score',
+                    'word_similarity_score': 'Word Similarity Score'
+                },
+                title='Word Mark Similarity Analysis',
+                color='word_similarity_score',
+                color_continuous_scale='Viridis',
+                size_max=10
+            )
         
-        # Update hover template to only show custom hover text
-        fig.update_traces(
-            hovertemplate='%{customdata[0]}<extra></extra>'
-        )
+            # Update hover template to only show custom hover text
+            fig.update_traces(
+                hovertemplate='%{customdata[0]}<extra></extra>'
+            )
         
-        # Update layout
-        fig.update_layout(
-            width=900,
-            height=600,
-            xaxis_title="Goods & Services Similarity Score",
-            yaxis_title="Word Similarity Score",
-            hovermode='closest'
-        )
+            # Update layout
+            fig.update_layout(
+                width=900,
+                height=600,
+                xaxis_title="Goods & Services Similarity Score",
+                yaxis_title="Word Similarity Score",
+                hovermode='closest'
+            )
         
-        st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(fig, use_container_width=True)
         
-        # Display data table
-        with st.expander("📊 View Detailed Results"):
-            # Get original serial_no values for display
-            serial_nos_display = df['serial_no'].astype(str)
+            # Display data table
+            with st.expander("📊 View Detailed Results"):
+                # Get original serial_no values for display
+                serial_nos_display = df['serial_no'].astype(str)
             
-            # Create dataframe
-            display_df = df[['serial_no', 'registration_no', 'mark_id_char', 'word_similarity_score', 'good_services_similarity_score']].copy()
+                # Create dataframe
+                display_df = df[['serial_no', 'registration_no', 'mark_id_char', 'word_similarity_score', 'good_services_similarity_score']].copy()
             
-            # Create URLs for Serial No
-            display_df['serial_no'] = serial_nos_display.apply(
-                lambda x: f"https://tsdr.uspto.gov/#caseNumber={x}&caseSearchType=US_APPLICATION&caseType=DEFAULT&searchType=statusSearch"
-            )
+                # Create URLs for Serial No
+                display_df['serial_no'] = serial_nos_display.apply(
+                    lambda x: f"https://tsdr.uspto.gov/#caseNumber={x}&caseSearchType=US_APPLICATION&caseType=DEFAULT&searchType=statusSearch"
+                )
             
-            # Rename columns
-            display_df.columns = ['Serial No', 'Registration No', 'Mark', 'Word Similarity Score', 'G&S Similarity Score']
+                # Rename columns
+                display_df.columns = ['Serial No', 'Registration No', 'Mark', 'Word Similarity Score', 'G&S Similarity Score']
             
-            # Display with LinkColumn and st.dataframe native sorting/filtering
-            st.dataframe(
-                display_df,
-                column_config={
-                    "Serial No": st.column_config.LinkColumn(
-                        "Serial No",
-                        display_text=r"caseNumber=(\d+)"
+                # Display with LinkColumn and st.dataframe native sorting/filtering
+                st.dataframe(
+                    display_df,
+                    column_config={
+                        "Serial No": st.column_config.LinkColumn(
+                            "Serial No",
+                            display_text=r"caseNumber=(\d+)"
+                        )
+                    },
+                    use_container_width=True
+                )
+
+    else:  # Batch (CSV Upload)
+        st.subheader("Batch Clearance")
+        st.write("Upload a CSV with `word_mark` and `gs_description` columns and an optional `nice_class` column. Identical rows are searched once.")
+
+        batch_file = st.file_uploader(
+            "Upload a CSV file",
+            type=["csv"],
+            key="word_mark_batch_uploader"
+        )
+
+        queries_df = None
+        if batch_file is not None:
+            try:
+                queries_df = load_word_mark_batch_csv(batch_file)
+                st.write(f"{len(queries_df)} unique queries loaded")
+            except Exception as e:
+                st.error(f"Could not read CSV: {str(e)}")
+
+        if st.button("Run Batch Search", key="word_mark_batch_button"):
+            if queries_df is not None and not queries_df.empty:
+                progress_bar = st.progress(0.0, text="Starting batch search...")
+                status_placeholder = st.empty()
+                status_df = queries_df.copy()
+                status_df['status'] = "Pending"
+                status_df['candidates'] = 0
+                status_placeholder.dataframe(status_df, use_container_width=True)
+                completed = []
+
+                def on_row_done(idx, results, error):
+                    """Update per-row status and overall progress as each query finishes"""
+                    completed.append(idx)
+                    if error:
+                        status_df.at[idx, 'status'] = f"Failed: {error}"
+                    else:
+                        status_df.at[idx, 'status'] = "Done"
+                        status_df.at[idx, 'candidates'] = len(results or [])
+                    progress_bar.progress(
+                        len(completed) / len(status_df),
+                        text=f"Completed {len(completed)} of {len(status_df)} queries"
                     )
-                },
-                use_container_width=True
-            )
+                    status_placeholder.dataframe(status_df, use_container_width=True)
+
+                outcomes = asyncio.run(run_word_mark_batch_async(queries_df, on_row_done=on_row_done))
+                store_dataframe("word_mark_batch_results", aggregate_word_mark_batch(queries_df, outcomes))
+                store_dataframe("word_mark_batch_status", status_df)
+                failed = int(status_df['status'].str.startswith("Failed").sum())
+                if failed:
+                    st.warning(f"{failed} of {len(status_df)} queries failed after retries.")
+                else:
+                    st.success(f"Completed {len(status_df)} queries.")
+            else:
+                st.warning("Please upload a CSV with at least one query.")
+
+        # Display aggregated batch results if they exist
+        batch_df = load_dataframe("word_mark_batch_results")
+        if batch_df is not None:
+
+            st.write("---")
+            st.subheader("Batch Results")
+
+            with st.expander("Per-query status"):
+                st.dataframe(load_dataframe("word_mark_batch_status"), use_container_width=True)
+
+            if batch_df.empty:
+                st.info("No similar word marks found for any query.")
+            else:
+                max_rank = int(batch_df['rank'].max())
+                # A slider needs min < max; with one candidate per query there is nothing to choose
+                if max_rank > 1:
+                    top_k = st.slider(
+                        "Top candidates per query:",
+                        min_value=1,
+                        max_value=max_rank,
+                        value=min(10, max_rank),
+                        key="word_mark_batch_top_k"
+                    )
+                else:
+                    top_k = max_rank
+                top_df = batch_df[batch_df['rank'] <= top_k]
+
+                # Combined scatter plot colored by query
+                top_df = top_df.assign(hover_text=
+                    "Query: " + top_df['query_word_mark'].astype(str)
+                    + "<br>Registration No: " + top_df['registration_no'].astype(str)
+                    + "<br>Mark: " + top_df['mark_id_char'].astype(str)
+                )
+                fig = px.scatter(
+                    top_df,
+                    x='good_services_similarity_score',
+                    y='word_similarity_score',
+                    color='query_word_mark',
+                    custom_data=['hover_text'],
+                    labels={
+                        'good_services_similarity_score': 'Goods & Services Similarity Score',
+                        'word_similarity_score': 'Word Similarity Score',
+                        'query_word_mark': 'Query'
+                    },
+                    title='Batch Word Mark Similarity Analysis'
+                )
+                fig.update_traces(
+                    hovertemplate='%{customdata[0]}<extra></extra>'
+                )
+                fig.update_layout(
+                    height=600,
+                    hovermode='closest'
+                )
+                st.plotly_chart(fig, use_container_width=True)
+
+                table_df = top_df[[
+                    'query_word_mark', 'query_gs_description', 'query_nice_class', 'rank',
+                    'serial_no', 'registration_no', 'mark_id_char',
+                    'word_similarity_score', 'good_services_similarity_score'
+                ]]
+                st.dataframe(table_df, use_container_width=True, hide_index=True)
+
+                st.download_button(
+                    label="📥 Download Results as CSV",
+                    data=table_df.to_csv(index=False).encode("utf-8"),
+                    file_name="word_mark_batch_results.csv",
+                    mime="text/csv",
+                    key="download_batch_csv_button"
+                )
             
 # ===== COORDINATE CLASS CALCULATOR PAGE =====
 elif page == "Coordinate Class Calculator":
@@ -694,26 +983,9 @@ elif page == "Coordinate Class Calculator":
         st.write("### Class Co-occurrence Probability Heatmap")
         st.write("This heatmap shows P(B|A): Probability that an applicant will file for Class B given they have filed for Class A. For ex: P(25 | 10) would give the probability that an applicant who has filed for Class 10 will also file for Class 25. Use this to identify potential coordinated classes based on historical filing patterns.")
         
-        # Pivot the dataframe to create a matrix for heatmap
-        heatmap_data = cc_analysis_df.pivot(
-            index='Class A',
-            columns='Class B',
-            values='P(B|A) (probability % that an application will file for class B given it has filed for class A)'
-        )
-        
-        # Sort both axes by extracting the numeric class number from the string
+        # Pivot into a Class A x Class B matrix, both axes sorted numerically
         # Assumes format like "1 (something)", "2 (something)", etc.
-        def extract_class_number(class_str):
-            """Extract numeric class number from string like '1 (something)'"""
-            try:
-                return int(str(class_str).split()[0])
-            except:
-                return 0
-        
-        # Sort index and columns numerically
-        sorted_index = sorted(heatmap_data.index, key=extract_class_number)
-        sorted_columns = sorted(heatmap_data.columns, key=extract_class_number)
-        heatmap_data = heatmap_data.reindex(index=sorted_index, columns=sorted_columns)
+        heatmap_data = build_cooccurrence_matrix(cc_analysis_df)
         
         # Custom binning and coloring scheme
         bins = [0, 5, 10, 15, 20, 25, 50, 100]
@@ -818,31 +1090,15 @@ elif page == "Coordinate Class Calculator":
             filter_button = st.button("🔎 Filter", key="filter_button")
         
         if filter_button:
-            # Filter the data
-            filtered_data = cc_analysis_df[
-                (cc_analysis_df['Class A'] == selected_class_a) & 
-                (cc_analysis_df['P(B|A) (probability % that an application will file for class B given it has filed for class A)'] > threshold)
-            ].copy()
+            # Filter the data, sorted by probability descending
+            display_df = filter_coordinated_classes(cc_analysis_df, selected_class_a, threshold)
             
-            if not filtered_data.empty:
-                # Sort by probability descending
-                filtered_data = filtered_data.sort_values(
-                    by='P(B|A) (probability % that an application will file for class B given it has filed for class A)',
-                    ascending=False
-                )
-                
-                st.success(f"Found {len(filtered_data)} coordinated classes for **{selected_class_a}** with probability > {threshold}%")
+            if not display_df.empty:
+                st.success(f"Found {len(display_df)} coordinated classes for **{selected_class_a}** with probability > {threshold}%")
                 
                 # Display results in a nice format
                 st.write(f"#### Coordinated Classes for {selected_class_a}")
                 
-                # Create a cleaner display dataframe
-                display_df = filtered_data[['Class B', 'P(B|A) (probability % that an application will file for class B given it has filed for class A)']].copy()
-                display_df.columns = ['Class B', 'Probability (%)']
-                display_df['Probability (%)'] = display_df['Probability (%)'].round(2)
-                display_df.reset_index(drop=True, inplace=True)
-                display_df.index = display_df.index + 1  # Start index from 1
-                
                 st.dataframe(display_df, use_container_width=True)
             else:
                 st.info(f"No coordinated classes found for **{selected_class_a}** with probability > {threshold}%")
@@ -851,4 +1107,111 @@ elif page == "Coordinate Class Calculator":
         with st.expander("📊 View Raw Data"):
             st.dataframe(cc_analysis_df, use_container_width=True)
     else:
-        st.warning("⚠️ Class co-occurrence data is not available. Please configure CC_ANALYSIS_FILE_PATH environment variable.")
\ No newline at end of file
+        st.warning("⚠️ Class co-occurrence data is not available. Please configure CC_ANALYSIS_FILE_PATH environment variable.")
+
+# ===== WATCHLISTS PAGE =====
+elif page == "Watchlists":
+    st.title("Saved Search Watchlists")
+    st.write("Saved searches are re-run against the live service and compared with their previous results; only marks that are new, or whose score or design codes changed, are reported.")
+    
+    collect_watchlist_job()
+    saved_searches = watchlist_store.list_saved_searches()
+    if not saved_searches:
+        st.info("No saved searches yet. Use **Save as watchlist** under logo or word mark results, or `python cli.py watchlist add`.")
+    else:
+        due_names = watchlist_store.due_saved_searches()
+        st.dataframe(pd.DataFrame([
+            {
+                "Name": saved["name"],
+                "Search": describe_saved_search(saved),
+                "Every (days)": saved["interval_days"],
+                "Last run": time.strftime("%Y-%m-%d %H:%M", time.localtime(saved["last_run_at"])) if saved["last_run_at"] else "Never",
+                "Marks in snapshot": saved["snapshot_size"],
+                "Due": saved["name"] in due_names,
+            }
+            for saved in saved_searches
+        ]), use_container_width=True, hide_index=True)
+        
+        all_names = [saved["name"] for saved in saved_searches]
+        selected_names = st.multiselect("Saved searches:", all_names, key="watchlist_selection")
+        
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.button("▶ Run selected", key="run_selected_watchlists_button", use_container_width=True,
+                      disabled=not selected_names, on_click=start_watchlist_run, args=(selected_names,))
+        with col2:
+            st.button(f"⏰ Run due ({len(due_names)})", key="run_due_watchlists_button", use_container_width=True,
+                      disabled=not due_names, on_click=start_watchlist_run, args=(due_names,))
+        with col3:
+            st.button("🔁 Run all", key="run_all_watchlists_button", use_container_width=True,
+                      on_click=start_watchlist_run, args=(all_names,))
+        with col4:
+            st.button("🗑 Delete selected", key="delete_watchlists_button", use_container_width=True,
+                      disabled=not selected_names, on_click=delete_watchlists, args=(selected_names,))
+    
+    # Outcome of the last run, then progress of the running one (if any)
+    if 'watchlist_job_message' in st.session_state:
+        message_type, message = st.session_state.pop('watchlist_job_message')
+        getattr(st, message_type)(message)
+    if st.session_state.get("watchlist_job") is not None:
+        render_running_watchlists()
+    
+    # Deltas from the last run in this session
+    outcomes = artifacts.get_json("watchlist_outcomes")
+    if outcomes:
+        st.write("---")
+        st.subheader("Last Run")
+        for outcome in outcomes:
+            name, delta = outcome["name"], outcome["delta"]
+            if outcome["error"]:
+                st.error(f"**{name}**: {outcome['error']}")
+                continue
+            
+            changes = len(delta["new"]) + len(delta["changed"])
+            with st.expander(f"{name}: {len(delta['new'])} new, {len(delta['changed'])} changed, "
+                             f"{len(delta['removed'])} removed ({outcome['total']} current)", expanded=bool(changes)):
+                st.caption(outcome["description"])
+                if changes:
+                    score_column = "word_similarity_score" if outcome["kind"] == "word_mark" else "similarity_score"
+                    delta_df = pd.DataFrame(
+                        [{**mark, "change": "new"} for mark in delta["new"]]
+                        + [{**mark, "change": "changed"} for mark in delta["changed"]]
+                    )
+                    columns = [c for c in ["change", "serial_no", "registration_no", "mark_id_char", score_column, "previous_score", "design_codes"] if c in delta_df.columns]
+                    st.dataframe(delta_df[columns], use_container_width=True, hide_index=True)
+                    
+                    pdf_data = artifacts.get(f"watchlist_pdf_{name}")
+                    if outcome.get("report_error"):
+                        st.error(outcome["report_error"])
+                    elif pdf_data is not None:
+                        st.download_button(
+                            label="📥 Download Delta Report as PDF",
+                            data=pdf_data,
+                            file_name=f"watchlist_{name}_delta.pdf",
+                            mime="application/pdf",
+                            key=f"download_watchlist_pdf_{name}"
+                        )
+                else:
+                    st.write("No new or changed marks since the previous run.")
+                if delta["removed"]:
+                    st.write(f"**No longer returned:** {', '.join(delta['removed'])}")
+
+# Session memory accounting (rendered last so it reflects this rerun's artifacts)
+with memory_panel:
+    session_stats = artifacts.stats()
+    st.write(f"**This session:** {format_bytes(session_stats['memory_bytes'])} in memory "
+             f"(budget {format_bytes(session_stats['memory_budget'])}), "
+             f"{format_bytes(session_stats['spilled_bytes'])} spilled to disk")
+    summary = process_memory_summary()
+    st.write(f"**All sessions ({summary['sessions']}):** {format_bytes(summary['memory_bytes'])} in memory, "
+             f"{format_bytes(summary['spilled_bytes'])} spilled, {summary['evictions']} evicted")
+    if SHOW_SESSION_MEMORY_TABLE:
+        st.dataframe(pd.DataFrame(redacted_session_stats(artifacts.session_id)), use_container_width=True, hide_index=True)
+    # Like cache_get, an unusable cache must never fail the page
+    try:
+        cache_stats = get_cache_backend().stats()
+    except Exception:
+        cache_stats = {}
+    if cache_stats:
+        st.write(f"**Shared cache:** {cache_stats['entries']} entries, "
+                 f"{format_bytes(cache_stats['total_bytes'])} of {format_bytes(cache_stats['max_bytes'])}")
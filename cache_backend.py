@@ -0,0 +1,259 @@
+"""Pluggable byte cache shared by the S3 loader, image fetches and similarity searches.
+
+The SQLite backend keeps everything in one database file, so every worker
+process on the same host shares it and it survives restarts. Writes happen in
+a single transaction (atomic across processes); reads never take the write
+lock. Entries expire per namespace TTL, and the total size is bounded by
+evicting the least recently used entries. Access times are only refreshed
+when older than CACHE_TOUCH_INTERVAL_SECONDS, and the refreshes are batched
+into later writes.
+
+Configuration:
+    CACHE_BACKEND     "sqlite" (default) or "none"
+    CACHE_PATH        database file (default: <tmpdir>/tm-cache.sqlite3)
+    CACHE_MAX_BYTES   total size bound (default: 512 MB)
+    CACHE_TTL_<NS>    TTL in seconds for namespace <NS>, e.g. CACHE_TTL_SEARCH=600
+    CACHE_TOUCH_INTERVAL_SECONDS  LRU access-time resolution (default: 60)
+"""
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "sqlite")
+CACHE_PATH = os.getenv("CACHE_PATH", os.path.join(tempfile.gettempdir(), "tm-cache.sqlite3"))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+CACHE_TOUCH_INTERVAL_SECONDS = float(os.getenv("CACHE_TOUCH_INTERVAL_SECONDS", "60"))
+# Pending access-time refreshes are written on the next set(), or on their own once this many queue up
+CACHE_TOUCH_BATCH_SIZE = 256
+
+# Default TTLs (seconds) per namespace; None means no expiry
+DEFAULT_NAMESPACE_TTLS = {
+    "s3": 24 * 3600,
+    "images": 7 * 24 * 3600,
+    "search": 3600,
+}
+
+
+def namespace_ttls():
+    """Default TTLs overridden by CACHE_TTL_<NAMESPACE> environment variables"""
+    ttls = dict(DEFAULT_NAMESPACE_TTLS)
+    for name, value in os.environ.items():
+        if name.startswith("CACHE_TTL_"):
+            ttls[name[len("CACHE_TTL_"):].lower()] = float(value)
+    return ttls
+
+
+def make_key(*parts):
+    """Stable cache key from str/bytes parts"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class CacheBackend:
+    """Interface for byte caches keyed by (namespace, key)"""
+
+    def get(self, namespace, key):
+        """Return cached bytes or None"""
+        raise NotImplementedError
+
+    def set(self, namespace, key, value):
+        """Store bytes under (namespace, key)"""
+        raise NotImplementedError
+
+    def delete(self, namespace, key):
+        """Remove (namespace, key) if present"""
+        raise NotImplementedError
+
+    def stats(self):
+        """Backend-specific usage numbers"""
+        return {}
+
+
+class NullCacheBackend(CacheBackend):
+    """Backend that caches nothing"""
+
+    def get(self, namespace, key):
+        return None
+
+    def set(self, namespace, key, value):
+        pass
+
+    def delete(self, namespace, key):
+        pass
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """SQLite-file cache safe to share between processes on one host"""
+
+    def __init__(self, path=CACHE_PATH, max_bytes=CACHE_MAX_BYTES, ttls=None, touch_interval=CACHE_TOUCH_INTERVAL_SECONDS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttls = namespace_ttls() if ttls is None else ttls
+        self.touch_interval = touch_interval
+        self._local = threading.local()
+        self._pending_touches = {}  # (namespace, key) -> accessed_at
+        self._touch_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    expires_at REAL,
+                    accessed_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO meta VALUES ('total_bytes', 0)")
+            # Kept alongside total_bytes so stats() never scans; seeded once for databases created without it
+            conn.execute("INSERT OR IGNORE INTO meta SELECT 'entries', COUNT(*) FROM entries")
+
+    def _connect(self, write=True):
+        # sqlite3 connections are not shareable across threads, so keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return _Transaction(conn, "IMMEDIATE" if write else "DEFERRED")
+
+    def get(self, namespace, key):
+        now = time.time()
+        # A deferred read transaction only takes a WAL snapshot, so reads run concurrently with each other and writers
+        with self._connect(write=False) as conn:
+            row = conn.execute(
+                "SELECT value, expires_at, accessed_at FROM entries WHERE namespace = ? AND key = ?",
+                (namespace, key)
+            ).fetchone()
+        if row is None:
+            return None
+        value, expires_at, accessed_at = row
+        if expires_at is not None and expires_at <= now:
+            # Left for the next overwrite or eviction to remove
+            return None
+        if now - accessed_at >= self.touch_interval:
+            self._touch(namespace, key, now)
+        return bytes(value)
+
+    def set(self, namespace, key, value):
+        value = bytes(value)
+        if len(value) > self.max_bytes:
+            return
+        now = time.time()
+        ttl = self.ttls.get(namespace)
+        expires_at = now + ttl if ttl is not None else None
+        with self._connect() as conn:
+            self._delete(conn, namespace, key)
+            conn.execute(
+                "INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                (namespace, key, value, len(value), expires_at, now)
+            )
+            conn.execute("UPDATE meta SET value = value + ? WHERE name = 'total_bytes'", (len(value),))
+            conn.execute("UPDATE meta SET value = value + 1 WHERE name = 'entries'")
+            self._flush_touches(conn)
+            self._evict(conn, now)
+
+    def delete(self, namespace, key):
+        with self._connect() as conn:
+            self._delete(conn, namespace, key)
+
+    def stats(self):
+        with self._connect(write=False) as conn:
+            meta = dict(conn.execute("SELECT name, value FROM meta WHERE name IN ('total_bytes', 'entries')"))
+        entries, total_bytes = meta["entries"], meta["total_bytes"]
+        return {"path": self.path, "entries": entries, "total_bytes": total_bytes, "max_bytes": self.max_bytes}
+
+    def _touch(self, namespace, key, now):
+        with self._touch_lock:
+            self._pending_touches[(namespace, key)] = now
+            flush = len(self._pending_touches) >= CACHE_TOUCH_BATCH_SIZE
+        if flush:
+            with self._connect() as conn:
+                self._flush_touches(conn)
+
+    def _flush_touches(self, conn):
+        with self._touch_lock:
+            touches, self._pending_touches = self._pending_touches, {}
+        conn.executemany(
+            "UPDATE entries SET accessed_at = MAX(accessed_at, ?) WHERE namespace = ? AND key = ?",
+            [(accessed_at, namespace, key) for (namespace, key), accessed_at in touches.items()]
+        )
+
+    def _delete(self, conn, namespace, key):
+        row = conn.execute(
+            "DELETE FROM entries WHERE namespace = ? AND key = ? RETURNING size",
+            (namespace, key)
+        ).fetchone()
+        if row is not None:
+            conn.execute("UPDATE meta SET value = value - ? WHERE name = 'total_bytes'", (row[0],))
+            conn.execute("UPDATE meta SET value = value - 1 WHERE name = 'entries'")
+
+    def _evict(self, conn, now):
+        total_bytes = conn.execute("SELECT value FROM meta WHERE name = 'total_bytes'").fetchone()[0]
+        if total_bytes <= self.max_bytes:
+            return
+
+        # Expired entries go first, then least recently used until under the bound
+        freed = conn.execute(
+            "DELETE FROM entries WHERE expires_at IS NOT NULL AND expires_at <= ? RETURNING size", (now,)
+        ).fetchall()
+        total_bytes -= sum(size for (size,) in freed)
+        removed = len(freed)
+        if total_bytes > self.max_bytes:
+            victims = []
+            to_free = total_bytes - self.max_bytes
+            for namespace, key, size in conn.execute(
+                "SELECT namespace, key, size FROM entries ORDER BY accessed_at"
+            ):
+                victims.append((namespace, key))
+                to_free -= size
+                total_bytes -= size
+                if to_free <= 0:
+                    break
+            conn.executemany("DELETE FROM entries WHERE namespace = ? AND key = ?", victims)
+            removed += len(victims)
+        conn.execute("UPDATE meta SET value = ? WHERE name = 'total_bytes'", (total_bytes,))
+        conn.execute("UPDATE meta SET value = value - ? WHERE name = 'entries'", (removed,))
+
+
+class _Transaction:
+    """Context manager running a block in one transaction
+
+    Writers use IMMEDIATE so they serialize across processes; readers use
+    DEFERRED, which never takes the write lock.
+    """
+
+    def __init__(self, conn, mode="IMMEDIATE"):
+        self.conn = conn
+        self.mode = mode
+
+    def __enter__(self):
+        self.conn.execute(f"BEGIN {self.mode}")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_cache_backend():
+    """Process-wide cache backend selected by CACHE_BACKEND"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = SQLiteCacheBackend() if CACHE_BACKEND == "sqlite" else NullCacheBackend()
+        return _backend
@@ -0,0 +1,295 @@
+"""Command-line entry point for running trademark searches and reports without Streamlit.
+
+Examples:
+    python cli.py logo --image logo.png --similarity shape --pdf report.pdf
+    python cli.py description --description "A chef in an apron" --json results.json
+    python cli.py word-mark-batch --csv queries.csv --out results.csv --top-k 10
+    python cli.py coordinate-classes --class-a 25 --threshold 20
+    python cli.py watchlist add --name acme-logo --image logo.png --similarity concept
+    python cli.py watchlist run --due --out-dir reports/
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+
+import pandas as pd
+from PIL import Image
+
+from tm_core import (
+    CC_ANALYSIS_FILE_PATH,
+    ReportError,
+    SimilaritySearchError,
+    aggregate_word_mark_batch,
+    download_csv_from_s3,
+    extract_class_number,
+    filter_coordinated_classes,
+    filter_marks_by_design_codes,
+    generate_pdf_report,
+    image_to_png_bytes,
+    load_word_mark_batch_csv,
+    run_word_mark_batch_async,
+    search_by_description,
+    search_by_image,
+    search_word_mark,
+)
+from watchlist import WATCHLIST_DB_PATH, WatchlistStore, describe_saved_search, generate_delta_report, run_saved_searches
+
+
+def parse_crop_box(value):
+    """Parse 'left,top,width,height' into a PIL crop box"""
+    try:
+        left, top, width, height = (int(v) for v in value.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError("crop must be 'left,top,width,height'")
+    return (left, top, left + width, top + height)
+
+
+def write_search_outputs(result, args, query_img=None, query_text=None, search_type_used=""):
+    """Write the raw JSON and/or a PDF report of the (optionally design-code filtered) marks"""
+    marks = result.get("similar_marks", []) or []
+    if args.design_codes:
+        marks = filter_marks_by_design_codes(marks, args.design_codes)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({**result, "similar_marks": marks}, f, indent=2)
+    if args.pdf:
+        pdf_buffer = generate_pdf_report(query_img, marks, search_type_used, query_text=query_text)
+        with open(args.pdf, "wb") as f:
+            f.write(pdf_buffer.getvalue())
+
+    print(f"Found {len(marks)} similar marks")
+    if not args.json:
+        for mark in marks:
+            print(f"{mark.get('serial_no')}\t{mark.get('similarity_score', 0):.4f}")
+
+
+def run_logo(args):
+    """Search by (optionally cropped) logo image"""
+    img = Image.open(args.image)
+    if args.crop:
+        img = img.crop(args.crop)
+    result = search_by_image(image_to_png_bytes(img), f"{args.similarity}_similarity")
+    write_search_outputs(result, args, query_img=img, search_type_used="Image (Upload Image)")
+
+
+def run_description(args):
+    """Search by logo description"""
+    result = search_by_description(args.description, args.gs_desc or "")
+    write_search_outputs(result, args, query_text=args.description, search_type_used="Image Description")
+
+
+def run_word_mark(args):
+    """Search a single word mark"""
+    results = search_word_mark(args.word_mark, args.gs_description, args.nice_class or "")
+    df = pd.DataFrame(results or [])
+    if args.out:
+        df.to_csv(args.out, index=False)
+    else:
+        print(df.to_csv(index=False), end="")
+
+
+def run_word_mark_batch(args):
+    """Search every row of a word mark CSV and write one aggregated CSV"""
+    queries_df = load_word_mark_batch_csv(args.csv)
+
+    def on_row_done(idx, results, error):
+        status = f"failed: {error}" if error else f"{len(results or [])} candidates"
+        print(f"[{idx + 1}/{len(queries_df)}] {queries_df.at[idx, 'word_mark']}: {status}", file=sys.stderr)
+
+    outcomes = asyncio.run(run_word_mark_batch_async(queries_df, on_row_done=on_row_done))
+    batch_df = aggregate_word_mark_batch(queries_df, outcomes)
+    if args.top_k and not batch_df.empty:
+        batch_df = batch_df[batch_df['rank'] <= args.top_k]
+    batch_df.to_csv(args.out, index=False)
+
+    failed = sum(1 for _, error in outcomes.values() if error)
+    return 1 if failed else 0
+
+
+def run_coordinate_classes(args):
+    """List coordinated classes for a Class A above a probability threshold"""
+    if not args.cc_path:
+        print("No co-occurrence data: pass --cc-path or set CC_ANALYSIS_FILE_PATH", file=sys.stderr)
+        return 2
+    cc_df = pd.read_csv(args.cc_path) if os.path.exists(args.cc_path) else download_csv_from_s3(args.cc_path)
+
+    matches = [c for c in cc_df['Class A'].unique() if extract_class_number(c) == args.class_a]
+    if not matches:
+        print(f"Class {args.class_a} not found", file=sys.stderr)
+        return 2
+    display_df = filter_coordinated_classes(cc_df, matches[0], args.threshold)
+    if args.out:
+        display_df.to_csv(args.out, index_label="Rank")
+    else:
+        print(display_df.to_string())
+
+
+def run_watchlist_add(args):
+    """Save a logo, description or word mark search to the watchlist"""
+    store = WatchlistStore(args.db)
+    if store.get_saved_search(args.name) is not None:
+        print(f"A watchlist named '{args.name}' already exists", file=sys.stderr)
+        return 2
+    if args.image:
+        img = Image.open(args.image)
+        if args.crop:
+            img = img.crop(args.crop)
+        store.add_saved_search(args.name, "image", {"similarity_type": f"{args.similarity}_similarity"},
+                               image_bytes=image_to_png_bytes(img), interval_days=args.interval_days)
+    elif args.description:
+        store.add_saved_search(args.name, "description", {"description": args.description, "gs_desc": args.gs_desc or ""},
+                               interval_days=args.interval_days)
+    elif args.word_mark and args.gs_description:
+        store.add_saved_search(args.name, "word_mark", {"word_mark": args.word_mark, "gs_description": args.gs_description,
+                                                        "nice_class": args.nice_class or ""},
+                               interval_days=args.interval_days)
+    else:
+        print("Pass --image, --description, or --word-mark with --gs-description", file=sys.stderr)
+        return 2
+
+
+def run_watchlist_list(args):
+    """List saved searches with their last run and snapshot size"""
+    for saved in WatchlistStore(args.db).list_saved_searches():
+        print(f"{saved['name']}\t{describe_saved_search(saved)}\tevery {saved['interval_days']:g}d\t"
+              f"{saved['snapshot_size']} marks in snapshot")
+
+
+def run_watchlist_remove(args):
+    """Remove a saved search"""
+    WatchlistStore(args.db).delete_saved_search(args.name)
+
+
+def run_watchlist_run(args):
+    """Re-run saved searches and write delta reports for the ones that changed"""
+    store = WatchlistStore(args.db)
+    if args.all:
+        names = [saved["name"] for saved in store.list_saved_searches()]
+    elif args.due:
+        names = store.due_saved_searches()
+    else:
+        names = args.name or []
+
+    outcomes = run_saved_searches(store, names)
+    failed = 0
+    for outcome in outcomes:
+        saved, delta = outcome["search"], outcome["delta"]
+        if outcome["error"]:
+            print(f"{saved['name']}: failed: {outcome['error']}", file=sys.stderr)
+            failed += 1
+            continue
+        print(f"{saved['name']}: {len(delta['new'])} new, {len(delta['changed'])} changed, "
+              f"{len(delta['removed'])} removed ({outcome['total']} current)")
+        if args.out_dir and (delta["new"] or delta["changed"]):
+            os.makedirs(args.out_dir, exist_ok=True)
+            base = os.path.join(args.out_dir, re.sub(r"[^A-Za-z0-9_.-]+", "_", saved["name"]))
+            pd.DataFrame(
+                [{**mark, "change": "new"} for mark in delta["new"]]
+                + [{**mark, "change": "changed"} for mark in delta["changed"]]
+            ).to_csv(f"{base}_delta.csv", index=False)
+            # The snapshot has already moved on, so keep going and report the failure in the exit code
+            try:
+                pdf_data = generate_delta_report(outcome).getvalue()
+            except ReportError as e:
+                print(f"{saved['name']}: {e}", file=sys.stderr)
+                failed += 1
+                continue
+            with open(f"{base}_delta.pdf", "wb") as f:
+                f.write(pdf_data)
+
+    return 1 if failed else 0
+
+
+def build_parser():
+    """Build the argument parser with one subcommand per tool"""
+    parser = argparse.ArgumentParser(description="Trademark similarity searches and reports")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    logo = subparsers.add_parser("logo", help="Search similar marks by logo image")
+    logo.add_argument("--image", required=True, help="Path to the logo image")
+    logo.add_argument("--similarity", choices=["shape", "concept"], default="shape")
+    logo.add_argument("--crop", type=parse_crop_box, help="Crop box as left,top,width,height")
+    logo.set_defaults(func=run_logo)
+
+    description = subparsers.add_parser("description", help="Search similar marks by logo description")
+    description.add_argument("--description", required=True)
+    description.add_argument("--gs-desc", help="Optional goods and services description")
+    description.set_defaults(func=run_description)
+
+    for sub in (logo, description):
+        sub.add_argument("--design-codes", nargs="+", help="Only keep marks with any of these design codes")
+        sub.add_argument("--json", help="Write results JSON to this path")
+        sub.add_argument("--pdf", help="Write a PDF report to this path")
+
+    word_mark = subparsers.add_parser("word-mark", help="Search similar word marks")
+    word_mark.add_argument("--word-mark", required=True)
+    word_mark.add_argument("--gs-description", required=True)
+    word_mark.add_argument("--nice-class")
+    word_mark.add_argument("--out", help="Write results CSV to this path (default: stdout)")
+    word_mark.set_defaults(func=run_word_mark)
+
+    batch = subparsers.add_parser("word-mark-batch", help="Search every row of a word mark CSV")
+    batch.add_argument("--csv", required=True, help="CSV with word_mark, gs_description and optional nice_class columns")
+    batch.add_argument("--out", required=True, help="Write aggregated results CSV to this path")
+    batch.add_argument("--top-k", type=int, help="Keep only the top K candidates per query")
+    batch.set_defaults(func=run_word_mark_batch)
+
+    cc = subparsers.add_parser("coordinate-classes", help="List coordinated classes above a threshold")
+    cc.add_argument("--class-a", type=int, required=True, help="NICE class number")
+    cc.add_argument("--threshold", type=float, default=20, help="Probability threshold (%%)")
+    cc.add_argument("--cc-path", default=CC_ANALYSIS_FILE_PATH, help="Local or s3:// path to the co-occurrence CSV")
+    cc.add_argument("--out", help="Write results CSV to this path (default: stdout)")
+    cc.set_defaults(func=run_coordinate_classes)
+
+    watchlist = subparsers.add_parser("watchlist", help="Saved searches re-run with delta reporting")
+    watchlist_commands = watchlist.add_subparsers(dest="watchlist_command", required=True)
+
+    wl_add = watchlist_commands.add_parser("add", help="Save a search")
+    wl_add.add_argument("--name", required=True)
+    wl_add.add_argument("--image", help="Logo image for an image search")
+    wl_add.add_argument("--crop", type=parse_crop_box, help="Crop box as left,top,width,height")
+    wl_add.add_argument("--similarity", choices=["shape", "concept"], default="shape")
+    wl_add.add_argument("--description", help="Logo description for a description search")
+    wl_add.add_argument("--gs-desc", help="Optional goods and services description (description search)")
+    wl_add.add_argument("--word-mark", help="Word mark for a word mark search")
+    wl_add.add_argument("--gs-description", help="Goods and services description (word mark search)")
+    wl_add.add_argument("--nice-class")
+    wl_add.add_argument("--interval-days", type=float, default=7, help="How often --due re-runs it")
+    wl_add.set_defaults(func=run_watchlist_add)
+
+    wl_list = watchlist_commands.add_parser("list", help="List saved searches")
+    wl_list.set_defaults(func=run_watchlist_list)
+
+    wl_remove = watchlist_commands.add_parser("remove", help="Remove a saved search")
+    wl_remove.add_argument("--name", required=True)
+    wl_remove.set_defaults(func=run_watchlist_remove)
+
+    wl_run = watchlist_commands.add_parser("run", help="Re-run saved searches and report what changed")
+    wl_selection = wl_run.add_mutually_exclusive_group(required=True)
+    wl_selection.add_argument("--name", nargs="+", help="Saved searches to run")
+    wl_selection.add_argument("--all", action="store_true", help="Run every saved search")
+    wl_selection.add_argument("--due", action="store_true", help="Run searches whose interval has elapsed (for cron)")
+    wl_run.add_argument("--out-dir", help="Write <name>_delta.pdf and <name>_delta.csv here")
+    wl_run.set_defaults(func=run_watchlist_run)
+
+    for sub in (wl_add, wl_list, wl_remove, wl_run):
+        sub.add_argument("--db", default=WATCHLIST_DB_PATH, help="Watchlist database path")
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args) or 0
+    except (SimilaritySearchError, ReportError) as e:
+        print(str(e), file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
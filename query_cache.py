@@ -0,0 +1,170 @@
+"""Near-duplicate cache for image similarity searches.
+
+Re-cropping a logo by a few pixels changes the PNG bytes but barely changes
+its difference hash (dHash). A 64-bit dHash is far too coarse to tell
+different logos apart, so reuse is scoped to crops of the same upload: entries
+are grouped by (upload hash, similarity type) and lookups walk that group's
+BK-tree for an earlier crop within PHASH_MAX_DISTANCE bits. Low-entropy
+hashes (near-blank crops) are never matched, and entries expire after
+PHASH_TTL_SECONDS. Entries should be small references to a result (the app
+stores the crop box and the result's key in the shared 'search' cache) rather
+than the result itself, which would sit outside every memory budget.
+"""
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image, ImageOps
+
+PHASH_MAX_DISTANCE = int(os.getenv("PHASH_MAX_DISTANCE", "5"))
+PHASH_MAX_ENTRIES = int(os.getenv("PHASH_MAX_ENTRIES", "1000"))
+# Crops whose aspect ratios differ by more than this fraction never match
+PHASH_MAX_ASPECT_DELTA = float(os.getenv("PHASH_MAX_ASPECT_DELTA", "0.1"))
+# Same default as the shared cache's "search" namespace
+PHASH_TTL_SECONDS = float(os.getenv("PHASH_TTL_SECONDS", "3600"))
+# Hashes with fewer set (or unset) bits than this carry too little structure to match on
+PHASH_MIN_BITS = int(os.getenv("PHASH_MIN_BITS", "8"))
+
+
+def dhash(img, hash_size=8):
+    """64-bit difference hash of a grayscale, contrast-normalized, downscaled image"""
+    gray = ImageOps.autocontrast(img.convert("L"))
+    pixels = np.asarray(gray.resize((hash_size + 1, hash_size), Image.Resampling.LANCZOS), dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int("".join("1" if bit else "0" for bit in bits), 2)
+
+
+def hamming_distance(a, b):
+    """Number of differing bits between two hashes"""
+    return bin(a ^ b).count("1")
+
+
+def is_informative_hash(hash_value, bits=64, min_bits=PHASH_MIN_BITS):
+    """False for near-constant hashes (blank or flat crops, e.g. 0 or all ones)"""
+    ones = bin(hash_value).count("1")
+    return min_bits <= ones <= bits - min_bits
+
+
+class BKTree:
+    """Burkhard-Keller tree over integer hashes with Hamming distance"""
+
+    def __init__(self):
+        self._root = None  # node: [hash, value, {distance: child node}]
+
+    def add(self, hash_value, value):
+        """Insert hash_value; an identical hash replaces the existing value, which is returned"""
+        if self._root is None:
+            self._root = [hash_value, value, {}]
+            return None
+        node = self._root
+        while True:
+            distance = hamming_distance(hash_value, node[0])
+            if distance == 0:
+                replaced, node[1] = node[1], value
+                return replaced
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [hash_value, value, {}]
+                return None
+            node = child
+
+    def search(self, hash_value, max_distance):
+        """All (distance, hash, value) within max_distance, nearest first"""
+        matches = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = hamming_distance(hash_value, node[0])
+            if distance <= max_distance:
+                matches.append((distance, node[0], node[1]))
+            # Triangle inequality: only children at distance d with |d - distance| <= max_distance can match
+            for child_distance, child in node[2].items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+        return sorted(matches, key=lambda match: match[0])
+
+
+class NearDuplicateQueryCache:
+    """Thread-safe LRU cache of search result references keyed by (upload hash, similarity type, dHash of the crop)"""
+
+    def __init__(self, max_distance=PHASH_MAX_DISTANCE, max_entries=PHASH_MAX_ENTRIES,
+                 max_aspect_delta=PHASH_MAX_ASPECT_DELTA, ttl=PHASH_TTL_SECONDS):
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self.max_aspect_delta = max_aspect_delta
+        self.ttl = ttl
+        self._entries = OrderedDict()  # entry id -> (scope, hash, aspect ratio, stored at, value)
+        self._trees = {}  # (upload hash, similarity type) -> BKTree of hash -> entry id
+        self._ids = itertools.count()
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    def lookup(self, img, upload_hash, similarity_type):
+        """Return the value stored for an earlier near-identical crop of the same upload, or None"""
+        key = _crop_key(img)
+        with self._lock:
+            tree = self._trees.get((upload_hash, similarity_type)) if key else None
+            if tree is not None:
+                hash_value, aspect = key
+                now = time.time()
+                for _, _, entry_id in tree.search(hash_value, self.max_distance):
+                    entry = self._entries.get(entry_id)
+                    if entry is None or now - entry[3] > self.ttl:
+                        continue
+                    if abs(entry[2] - aspect) <= self.max_aspect_delta * entry[2]:
+                        self._entries.move_to_end(entry_id)
+                        self._hits += 1
+                        return entry[4]
+            self._misses += 1
+            return None
+
+    def store(self, img, upload_hash, similarity_type, value):
+        """Remember a value (a reference to the result) for this crop, evicting expired and least recently used entries when full"""
+        key = _crop_key(img)
+        if key is None:
+            return
+        hash_value, aspect = key
+        scope = (upload_hash, similarity_type)
+        with self._lock:
+            entry_id = next(self._ids)
+            self._entries[entry_id] = (scope, hash_value, aspect, time.time(), value)
+            replaced = self._trees.setdefault(scope, BKTree()).add(hash_value, entry_id)
+            self._entries.pop(replaced, None)
+            if len(self._entries) > self.max_entries:
+                self._evict()
+
+    def stats(self):
+        """Hit/miss counts and hit rate"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+            }
+
+    def _evict(self):
+        # BK-trees do not support deletion, so drop expired entries plus ~10% of the rest at once and rebuild
+        cutoff = time.time() - self.ttl
+        for entry_id in [entry_id for entry_id, entry in self._entries.items() if entry[3] < cutoff]:
+            del self._entries[entry_id]
+        while len(self._entries) > self.max_entries - max(1, self.max_entries // 10):
+            self._entries.popitem(last=False)
+        self._trees = {}
+        for entry_id, (scope, hash_value, _, _, _) in self._entries.items():
+            self._trees.setdefault(scope, BKTree()).add(hash_value, entry_id)
+
+
+def _crop_key(img):
+    """(dHash, aspect ratio) of a crop, or None for degenerate or low-entropy crops that must not be matched"""
+    if img is None or img.width < 1 or img.height < 1:
+        return None
+    hash_value = dhash(img)
+    if not is_informative_hash(hash_value):
+        return None
+    return hash_value, img.width / img.height
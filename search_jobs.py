@@ -0,0 +1,85 @@
+"""Background search jobs so searches don't block the Streamlit script thread.
+
+A job runs on its own daemon thread and collects similar marks in batches as
+the response is decoded. At most SEARCH_JOB_WORKERS jobs search at once; a job
+gives up its slot the moment it is cancelled, so superseded searches that are
+still unwinding never hold capacity. The UI polls snapshot() to render partial
+results, and can cancel a job or supersede it with a new one.
+"""
+import os
+import threading
+import time
+
+from tm_core import CancelEvent, SearchCancelled
+
+SEARCH_JOB_WORKERS = int(os.getenv("SEARCH_JOB_WORKERS", "8"))
+
+_SLOTS = threading.BoundedSemaphore(SEARCH_JOB_WORKERS)
+
+
+class SearchJob:
+    """A search running in the background; status is running, done, cancelled or failed"""
+
+    def __init__(self, label, search_type_used):
+        self.label = label
+        self.search_type_used = search_type_used
+        self.status = "running"
+        self.result = None
+        self.error = None
+        self.started_at = time.time()
+        self.cancel_event = CancelEvent()
+        self._marks = []
+        self._holds_slot = False
+        self._lock = threading.Lock()
+
+    def add_marks(self, marks):
+        """Append a batch of decoded marks (called from the worker thread)"""
+        with self._lock:
+            self._marks.extend(marks)
+
+    def cancel(self):
+        """Cancel right away: abort the in-flight request, free the job's slot and discard its result"""
+        self.cancel_event.set()
+        with self._lock:
+            if self.status == "running":
+                self.status = "cancelled"
+        self._release_slot()
+
+    def snapshot(self):
+        """(status, marks received so far, final result, error) as of now"""
+        with self._lock:
+            return self.status, list(self._marks), self.result, self.error
+
+    def _run(self, search_fn):
+        _SLOTS.acquire()
+        with self._lock:
+            self._holds_slot = True
+            cancelled = self.status != "running"
+        if cancelled:
+            self._release_slot()
+            return
+        try:
+            result = search_fn(on_marks=self.add_marks, cancel_event=self.cancel_event)
+            status, error = ("cancelled", None) if self.cancel_event.is_set() else ("done", None)
+        except SearchCancelled:
+            result, status, error = None, "cancelled", None
+        except Exception as e:
+            result, status, error = None, "failed", str(e)
+        finally:
+            self._release_slot()
+        with self._lock:
+            if self.status == "running":
+                self.result, self.status, self.error = result, status, error
+
+    def _release_slot(self):
+        with self._lock:
+            held, self._holds_slot = self._holds_slot, False
+        if held:
+            _SLOTS.release()
+
+
+def submit_search_job(search_fn, label, search_type_used):
+    """Start search_fn(on_marks=..., cancel_event=...) in the background and return its SearchJob"""
+    job = SearchJob(label, search_type_used)
+    threading.Thread(target=job._run, args=(search_fn,), name="search-job", daemon=True).start()
+    return job
@@ -0,0 +1,214 @@
+"""Per-session storage for large artifacts (raw search results, PDFs) with a memory budget.
+
+Each session gets a SessionArtifactStore holding bytes. Once the in-memory bytes
+exceed the session's budget, least recently used artifacts spill to a temp
+directory; once the spilled bytes exceed the spill budget, the least recently
+used spilled artifacts are evicted entirely. A spilled artifact read back into
+memory keeps its file, so it is never written to disk twice while unchanged;
+artifacts larger than the memory budget are served straight from disk. Every
+live store is registered so the process-wide memory use can be inspected.
+"""
+import json
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+
+SESSION_MEMORY_BUDGET_BYTES = int(os.getenv("SESSION_MEMORY_BUDGET_BYTES", str(16 * 1024 * 1024)))
+SESSION_SPILL_BUDGET_BYTES = int(os.getenv("SESSION_SPILL_BUDGET_BYTES", str(128 * 1024 * 1024)))
+# Parsed JSON takes roughly this many times its encoded size in Python objects (~3.8x measured on search results)
+DECODED_JSON_SIZE_FACTOR = float(os.getenv("DECODED_JSON_SIZE_FACTOR", "4"))
+
+# session_id -> store; entries disappear once Streamlit drops the session state
+_REGISTRY = weakref.WeakValueDictionary()
+_REGISTRY_LOCK = threading.Lock()
+
+
+class SessionArtifactStore:
+    """LRU byte store with an in-memory budget and a size-bounded temp-file spill tier"""
+
+    def __init__(self, session_id, memory_budget=SESSION_MEMORY_BUDGET_BYTES, spill_budget=SESSION_SPILL_BUDGET_BYTES):
+        self.session_id = session_id
+        self.memory_budget = memory_budget
+        self.spill_budget = spill_budget
+        self._memory = OrderedDict()  # key -> bytes
+        self._spilled = OrderedDict()  # key -> (path, size); may also be in _memory as a clean copy
+        self._decoded = {}  # key -> (value decoded by get_json, estimated size); only while the key's bytes are in memory
+        self._memory_bytes = 0  # bytes in memory plus the estimated size of decoded values
+        self._spilled_bytes = 0
+        self._evictions = 0
+        self._spill_dir = None
+        self._lock = threading.RLock()
+
+        with _REGISTRY_LOCK:
+            _REGISTRY[session_id] = self
+
+    def put(self, key, data):
+        """Store bytes under key, spilling/evicting older artifacts to stay within budget"""
+        data = bytes(data)
+        with self._lock:
+            self._discard(key)
+            self._memory[key] = data
+            self._memory_bytes += len(data)
+            self._enforce_budgets()
+
+    def get(self, key):
+        """Return the bytes stored under key (None if missing or evicted), marking it recently used"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                if key in self._spilled:
+                    self._spilled.move_to_end(key)
+                return self._memory[key]
+            if key in self._spilled:
+                path, size = self._spilled[key]
+                self._spilled.move_to_end(key)
+                with open(path, "rb") as f:
+                    data = f.read()
+                # Keep a clean in-memory copy (the file stays) unless it could never fit the budget
+                if size <= self.memory_budget:
+                    self._memory[key] = data
+                    self._memory_bytes += size
+                    self._enforce_budgets()
+                return data
+            return None
+
+    def put_json(self, key, value):
+        """Store a JSON-serializable value"""
+        self.put(key, json.dumps(value).encode("utf-8"))
+
+    def get_json(self, key):
+        """Return a stored JSON value (None if missing or evicted)
+
+        The decoded value is reused until the artifact is replaced or leaves
+        memory, so callers must treat it as read-only. Its estimated size
+        (DECODED_JSON_SIZE_FACTOR times the encoded size) counts against the
+        memory budget; values that could not fit are decoded on every call.
+        """
+        with self._lock:
+            if key in self._decoded:
+                self._memory.move_to_end(key)
+                return self._decoded[key][0]
+            data = self.get(key)
+            if data is None:
+                return None
+            value = json.loads(data)
+            decoded_size = int(len(data) * DECODED_JSON_SIZE_FACTOR)
+            if key in self._memory and len(data) + decoded_size <= self.memory_budget:
+                self._decoded[key] = (value, decoded_size)
+                self._memory_bytes += decoded_size
+                self._enforce_budgets()
+            return value
+
+    def discard(self, key):
+        """Remove key from both tiers"""
+        with self._lock:
+            self._discard(key)
+
+    def clear(self):
+        """Remove every artifact from both tiers"""
+        with self._lock:
+            for key in list(self._memory) + list(self._spilled):
+                self._discard(key)
+
+    def __contains__(self, key):
+        return key in self._memory or key in self._spilled
+
+    def stats(self):
+        """Memory accounting for this session"""
+        with self._lock:
+            return {
+                "session_id": self.session_id,
+                "memory_bytes": self._memory_bytes,
+                "decoded_bytes": sum(size for _, size in self._decoded.values()),
+                "spilled_bytes": self._spilled_bytes,
+                "memory_items": len(self._memory),
+                "spilled_items": len(self._spilled),
+                "evictions": self._evictions,
+                "memory_budget": self.memory_budget,
+                "spill_budget": self.spill_budget,
+            }
+
+    def _discard(self, key):
+        self._drop_decoded(key)
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key))
+        if key in self._spilled:
+            path, size = self._spilled.pop(key)
+            self._spilled_bytes -= size
+            _remove_file(path)
+
+    def _enforce_budgets(self):
+        # Spill least recently used artifacts until memory fits the budget (clean copies are just dropped)
+        while self._memory_bytes > self.memory_budget and self._memory:
+            key, data = self._memory.popitem(last=False)
+            self._memory_bytes -= len(data)
+            self._drop_decoded(key)
+            if key not in self._spilled:
+                self._spill(key, data)
+
+        # Evict least recently used spilled artifacts until the spill tier fits its budget
+        while self._spilled_bytes > self.spill_budget and self._spilled:
+            _, (path, size) = self._spilled.popitem(last=False)
+            self._spilled_bytes -= size
+            self._evictions += 1
+            _remove_file(path)
+
+    def _drop_decoded(self, key):
+        if key in self._decoded:
+            self._memory_bytes -= self._decoded.pop(key)[1]
+
+    def _spill(self, key, data):
+        if self._spill_dir is None:
+            self._spill_dir = tempfile.mkdtemp(prefix="tm-session-")
+            # Remove spilled files when the session (and this store) goes away
+            weakref.finalize(self, shutil.rmtree, self._spill_dir, True)
+
+        fd, path = tempfile.mkstemp(dir=self._spill_dir)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        self._spilled[key] = (path, len(data))
+        self._spilled_bytes += len(data)
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def all_session_stats():
+    """Memory accounting for every live session store in this process"""
+    with _REGISTRY_LOCK:
+        stores = list(_REGISTRY.values())
+    return [store.stats() for store in stores]
+
+
+def redacted_session_stats(current_session_id):
+    """all_session_stats() with session ids replaced by labels, so no session sees another's id"""
+    return [
+        {**stats, "session_id": "this session" if stats["session_id"] == current_session_id else f"session {i}"}
+        for i, stats in enumerate(all_session_stats(), 1)
+    ]
+
+
+def process_memory_summary():
+    """Totals across all live session stores in this process"""
+    stats = all_session_stats()
+    return {
+        "sessions": len(stats),
+        "memory_bytes": sum(s["memory_bytes"] for s in stats),
+        "spilled_bytes": sum(s["spilled_bytes"] for s in stats),
+        "evictions": sum(s["evictions"] for s in stats),
+    }
+
+
+def format_bytes(num_bytes):
+    """Human-readable byte count"""
+    for unit in ["B", "KB", "MB", "GB"]:
+        if num_bytes < 1024 or unit == "GB":
+            return f"{num_bytes:.0f} {unit}" if unit == "B" else f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Keep tests away from the shared on-disk cache; backends under test are created explicitly
+os.environ.setdefault("CACHE_BACKEND", "none")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
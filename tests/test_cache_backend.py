@@ -0,0 +1,117 @@
+import sqlite3
+import time
+
+import pytest
+
+from cache_backend import SQLiteCacheBackend, make_key
+
+
+@pytest.fixture
+def backend(tmp_path):
+    return SQLiteCacheBackend(str(tmp_path / "cache.sqlite3"), max_bytes=300, ttls={"search": 60}, touch_interval=0)
+
+
+def test_round_trip_and_delete(backend):
+    backend.set("search", "k", b"value")
+    assert backend.get("search", "k") == b"value"
+    assert backend.get("images", "k") is None
+
+    backend.delete("search", "k")
+    assert backend.get("search", "k") is None
+    assert backend.stats()["total_bytes"] == 0
+
+
+def test_overwrite_keeps_total_bytes_accurate(backend):
+    backend.set("search", "k", b"x" * 50)
+    backend.set("search", "k", b"x" * 20)
+    assert backend.stats() == {"path": backend.path, "entries": 1, "total_bytes": 20, "max_bytes": 300}
+
+
+def test_expired_entries_are_not_served(backend, monkeypatch):
+    backend.set("search", "k", b"value")
+    backend.set("s3", "k", b"value")  # no TTL configured for s3
+
+    later = time.time() + 61
+    monkeypatch.setattr(time, "time", lambda: later)
+    assert backend.get("search", "k") is None
+    assert backend.get("s3", "k") == b"value"
+
+
+def test_evicts_least_recently_used_first(backend):
+    for key in "abc":
+        backend.set("s3", key, b"x" * 100)
+        time.sleep(0.01)
+    backend.get("s3", "a")  # "b" is now the least recently used
+
+    backend.set("s3", "d", b"x" * 100)
+    assert [key for key in "abcd" if backend.get("s3", key)] == ["a", "c", "d"]
+    assert backend.stats()["total_bytes"] <= backend.max_bytes
+
+
+def test_expired_entries_are_evicted_before_live_ones(backend, monkeypatch):
+    backend.set("search", "old", b"x" * 100)
+    now = time.time()
+    backend.set("s3", "a", b"x" * 100)
+    backend.set("s3", "b", b"x" * 100)
+
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    backend.set("s3", "c", b"x" * 100)
+    assert [key for key in "abc" if backend.get("s3", key)] == ["a", "b", "c"]
+
+
+def test_values_larger_than_the_bound_are_not_stored(backend):
+    backend.set("s3", "huge", b"x" * 301)
+    assert backend.get("s3", "huge") is None
+
+
+def test_reads_do_not_wait_for_a_writer(backend):
+    backend.set("s3", "k", b"value")
+    writer = sqlite3.connect(backend.path, isolation_level=None)
+    writer.execute("BEGIN IMMEDIATE")
+    writer.execute("UPDATE meta SET value = value")
+    try:
+        started = time.time()
+        assert backend.get("s3", "k") == b"value"
+        assert time.time() - started < 1
+    finally:
+        writer.execute("ROLLBACK")
+        writer.close()
+
+
+def test_make_key_distinguishes_part_boundaries():
+    assert make_key("ab", "c") != make_key("a", "bc")
+    assert make_key("a", b"b") == make_key("a", "b")
+
+
+def test_entry_count_tracks_sets_deletes_and_evictions(backend):
+    for key in "abc":
+        backend.set("s3", key, b"x" * 100)
+    backend.set("s3", "a", b"x" * 50)  # overwrite
+    backend.delete("s3", "c")
+    backend.delete("s3", "missing")
+    assert backend.stats()["entries"] == 2
+
+    backend.set("s3", "d", b"x" * 200)  # evicts until under the bound
+    assert backend.stats()["entries"] == len([key for key in "abcd" if backend.get("s3", key)])
+
+
+def test_entry_count_is_seeded_for_existing_databases(backend):
+    backend.set("s3", "a", b"x")
+    backend.set("s3", "b", b"x")
+    with sqlite3.connect(backend.path) as conn:
+        conn.execute("DELETE FROM meta WHERE name = 'entries'")
+    assert SQLiteCacheBackend(backend.path).stats()["entries"] == 2
+
+
+def test_stats_do_not_wait_for_a_writer(backend):
+    backend.set("s3", "k", b"value")
+    writer = sqlite3.connect(backend.path, isolation_level=None)
+    writer.execute("BEGIN IMMEDIATE")
+    writer.execute("UPDATE meta SET value = value")
+    try:
+        started = time.time()
+        assert backend.stats()["entries"] == 1
+        assert time.time() - started < 1
+    finally:
+        writer.execute("ROLLBACK")
+        writer.close()
@@ -0,0 +1,62 @@
+import argparse
+
+import pandas as pd
+import pytest
+
+from cli import build_parser, main, parse_crop_box, run_logo, run_watchlist_run
+from tm_core import CC_PROBABILITY_COLUMN
+from watchlist import WATCHLIST_DB_PATH, WatchlistStore
+
+
+def test_watchlist_add_rejects_a_duplicate_name(tmp_path, capsys):
+    db = str(tmp_path / "watchlist.sqlite3")
+    add = ["watchlist", "add", "--name", "chef", "--description", "a chef", "--db", db]
+    assert main(add) == 0
+    assert main(add[:-4] + ["--description", "another chef", "--db", db]) == 2
+    assert "already exists" in capsys.readouterr().err
+    assert WatchlistStore(db).get_saved_search("chef")["params"]["description"] == "a chef"
+
+
+def test_parser_routes_subcommands_and_parses_crop_boxes():
+    args = build_parser().parse_args(["logo", "--image", "logo.png", "--crop", "10,20,100,50", "--design-codes", "01.01.01", "26.01.01"])
+    assert args.func is run_logo
+    assert args.crop == (10, 20, 110, 70)
+    assert args.similarity == "shape" and args.design_codes == ["01.01.01", "26.01.01"]
+
+    args = build_parser().parse_args(["watchlist", "run", "--due"])
+    assert args.func is run_watchlist_run and args.due and args.db == WATCHLIST_DB_PATH
+    assert build_parser().parse_args(["coordinate-classes", "--class-a", "25"]).threshold == 20
+
+
+@pytest.mark.parametrize("argv", [
+    [],
+    ["logo", "--image", "logo.png", "--crop", "10,20,100"],
+    ["logo", "--image", "logo.png", "--similarity", "colour"],
+    ["watchlist", "run"],
+    ["watchlist", "run", "--all", "--due"],
+    ["word-mark", "--word-mark", "GOOGLE"],
+])
+def test_parser_rejects_invalid_arguments(argv):
+    with pytest.raises(SystemExit) as exc_info:
+        build_parser().parse_args(argv)
+    assert exc_info.value.code == 2
+
+
+def test_parse_crop_box_rejects_non_numbers():
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_crop_box("a,b,c,d")
+
+
+def test_coordinate_classes_from_a_local_csv(tmp_path, capsys):
+    cc_path = tmp_path / "cc.csv"
+    pd.DataFrame({
+        "Class A": ["25 (clothing)", "25 (clothing)", "9 (software)"],
+        "Class B": ["18 (leather)", "35 (advertising)", "42 (it services)"],
+        CC_PROBABILITY_COLUMN: [40.0, 10.0, 60.0],
+    }).to_csv(cc_path, index=False)
+    out_path = tmp_path / "out.csv"
+    assert main(["coordinate-classes", "--class-a", "25", "--cc-path", str(cc_path), "--out", str(out_path)]) == 0
+    assert pd.read_csv(out_path).to_dict("records") == [{"Rank": 1, "Class B": "18 (leather)", "Probability (%)": 40.0}]
+
+    assert main(["coordinate-classes", "--class-a", "7", "--cc-path", str(cc_path)]) == 2
+    assert "Class 7 not found" in capsys.readouterr().err
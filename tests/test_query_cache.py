@@ -0,0 +1,99 @@
+import random
+import time
+
+from PIL import Image, ImageDraw
+
+from query_cache import BKTree, NearDuplicateQueryCache, dhash, hamming_distance, is_informative_hash
+
+
+def logo():
+    img = Image.new("RGB", (300, 300), "white")
+    draw = ImageDraw.Draw(img)
+    draw.ellipse((30, 30, 200, 200), fill="red")
+    draw.rectangle((150, 120, 280, 280), fill="blue")
+    return img
+
+
+def word_logo(text):
+    img = Image.new("RGB", (300, 120), "white")
+    ImageDraw.Draw(img).text((100, 50), text, fill="black")
+    return img
+
+
+def test_bktree_search_matches_brute_force():
+    rng = random.Random(0)
+    hashes = [rng.getrandbits(64) for _ in range(500)]
+    tree = BKTree()
+    for i, hash_value in enumerate(hashes):
+        tree.add(hash_value, i)
+
+    query = hashes[0] ^ 0b1011  # 3 bits away from the first hash
+    expected = sorted(
+        (hamming_distance(query, h), i) for i, h in enumerate(hashes) if hamming_distance(query, h) <= 12
+    )
+    found = tree.search(query, 12)
+    assert [(distance, value) for distance, _, value in found] == expected
+    assert found[0][2] == 0
+
+
+def test_bktree_add_returns_replaced_value():
+    tree = BKTree()
+    assert tree.add(42, "a") is None
+    assert tree.add(42, "b") == "a"
+    assert [value for _, _, value in tree.search(42, 0)] == ["b"]
+
+
+def test_blank_and_flat_hashes_are_not_informative():
+    assert not is_informative_hash(0)
+    assert not is_informative_hash(2 ** 64 - 1)
+    assert not is_informative_hash(dhash(Image.new("RGB", (300, 120), "white")))
+    assert is_informative_hash(dhash(logo()))
+
+
+def test_recrop_of_same_upload_reuses_result():
+    cache = NearDuplicateQueryCache()
+    cache.store(logo(), "upload-1", "shape_similarity", "result")
+    assert cache.lookup(logo().crop((2, 2, 298, 297)), "upload-1", "shape_similarity") == "result"
+    assert cache.lookup(logo(), "upload-1", "concept_similarity") is None
+
+
+def test_distinct_logos_never_share_results():
+    cache = NearDuplicateQueryCache()
+    acme, nike = word_logo("ACME"), word_logo("NIKE")
+    cache.store(acme, "acme-upload", "shape_similarity", "acme results")
+    assert cache.lookup(nike, "nike-upload", "shape_similarity") is None
+    # Short text on a blank canvas hashes too coarsely to be matched at all, even within one upload
+    cache.store(acme, "shared-upload", "shape_similarity", "acme results")
+    assert cache.lookup(nike, "shared-upload", "shape_similarity") is None
+
+
+def test_same_pixels_from_another_upload_do_not_match():
+    cache = NearDuplicateQueryCache()
+    cache.store(logo(), "upload-1", "shape_similarity", "result")
+    assert cache.lookup(logo(), "upload-2", "shape_similarity") is None
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    cache = NearDuplicateQueryCache(ttl=60)
+    cache.store(logo(), "upload-1", "shape_similarity", "result")
+    later = time.time() + 61
+    monkeypatch.setattr(time, "time", lambda: later)
+    assert cache.lookup(logo(), "upload-1", "shape_similarity") is None
+
+
+def test_degenerate_crops_skip_the_cache():
+    cache = NearDuplicateQueryCache()
+    flat = Image.new("RGB", (300, 0))
+    cache.store(flat, "upload-1", "shape_similarity", "result")
+    assert cache.lookup(flat, "upload-1", "shape_similarity") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_eviction_keeps_most_recently_used_entries():
+    cache = NearDuplicateQueryCache(max_entries=10)
+    base = logo()
+    for i in range(12):
+        cache.store(base, f"upload-{i}", "shape_similarity", i)
+    assert cache.stats()["entries"] <= 10
+    assert cache.lookup(base, "upload-11", "shape_similarity") == 11
+    assert cache.lookup(base, "upload-0", "shape_similarity") is None
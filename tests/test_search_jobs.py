@@ -0,0 +1,94 @@
+import http.server
+import threading
+import time
+
+import pytest
+
+import search_jobs
+import tm_core
+
+
+@pytest.fixture
+def hanging_service(monkeypatch):
+    """Similarity service that accepts requests but never answers in time"""
+    release = threading.Event()
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_POST(self):
+            release.wait(30)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(tm_core, "SIMILARITY_SVC_URL", f"http://127.0.0.1:{server.server_port}")
+    yield
+    release.set()
+    server.shutdown()
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_cancel_event_aborts_a_request_waiting_for_the_upstream(hanging_service):
+    cancel_event = tm_core.CancelEvent()
+    outcome = {}
+
+    def search():
+        try:
+            tm_core.search_by_description("a chef", use_cache=False, cancel_event=cancel_event)
+        except tm_core.SearchCancelled:
+            outcome["cancelled"] = True
+
+    worker = threading.Thread(target=search)
+    worker.start()
+    time.sleep(0.3)
+    cancel_event.set()
+    worker.join(timeout=5)
+    assert not worker.is_alive()
+    assert outcome == {"cancelled": True}
+
+
+def test_cancelled_jobs_free_their_slot_at_once(hanging_service, monkeypatch):
+    monkeypatch.setattr(search_jobs, "_SLOTS", threading.BoundedSemaphore(1))
+
+    def search(**kwargs):
+        return tm_core.search_by_description("a chef", use_cache=False, **kwargs)
+
+    first = search_jobs.submit_search_job(search, "first", "Image Description")
+    assert wait_for(lambda: first._holds_slot)
+    first.cancel()
+    assert first.snapshot()[0] == "cancelled"
+
+    second = search_jobs.submit_search_job(lambda **kwargs: {"similar_marks": []}, "second", "Image Description")
+    assert wait_for(lambda: second.snapshot()[0] == "done", timeout=2)
+
+
+def test_job_collects_marks_and_result():
+    def search(on_marks, cancel_event):
+        on_marks([{"serial_no": 1}])
+        on_marks([{"serial_no": 2}])
+        return {"similar_marks": [{"serial_no": 1}, {"serial_no": 2}]}
+
+    job = search_jobs.submit_search_job(search, "label", "Image Description")
+    assert wait_for(lambda: job.snapshot()[0] == "done")
+    status, marks, result, error = job.snapshot()
+    assert marks == [{"serial_no": 1}, {"serial_no": 2}]
+    assert result["similar_marks"] == marks and error is None
+
+
+def test_failed_job_reports_error():
+    def search(on_marks, cancel_event):
+        raise tm_core.SimilaritySearchError(500, "boom")
+
+    job = search_jobs.submit_search_job(search, "label", "Image Description")
+    assert wait_for(lambda: job.snapshot()[0] == "failed")
+    assert job.snapshot()[3] == "Error: 500 - boom"
@@ -0,0 +1,111 @@
+import json
+import os
+
+import pytest
+
+import session_store
+from session_store import SessionArtifactStore, process_memory_summary, redacted_session_stats
+
+
+@pytest.fixture
+def store():
+    store = SessionArtifactStore("test-session", memory_budget=100, spill_budget=250)
+    yield store
+    store.clear()
+
+
+def spilled_paths(store):
+    return [path for path, _ in store._spilled.values()]
+
+
+def test_spills_least_recently_used_past_memory_budget(store):
+    store.put("a", b"a" * 60)
+    store.put("b", b"b" * 60)
+    stats = store.stats()
+    assert (stats["memory_bytes"], stats["spilled_bytes"]) == (60, 60)
+    assert "a" in store._spilled and "b" in store._memory
+    assert all(os.path.exists(path) for path in spilled_paths(store))
+
+
+def test_rereads_spilled_artifact_without_rewriting_it(store, monkeypatch):
+    store.put("a", b"a" * 60)
+    store.put("b", b"b" * 60)
+    writes = []
+    spill = store._spill
+    monkeypatch.setattr(store, "_spill", lambda key, data: writes.append(key) or spill(key, data))
+
+    for _ in range(3):
+        assert store.get("a") == b"a" * 60
+        assert store.get("b") == b"b" * 60
+    # "b" is written once when it first leaves memory; "a" keeps its file as a clean copy
+    assert writes == ["b"]
+
+
+def test_artifacts_larger_than_memory_budget_are_served_from_disk(store):
+    store.put("big", b"x" * 150)
+    assert store.get("big") == b"x" * 150
+    assert store.stats()["memory_bytes"] == 0 and store.stats()["spilled_bytes"] == 150
+
+
+def test_spill_budget_evicts_least_recently_used(store):
+    for key in "abcde":
+        store.put(key, key.encode() * 90)
+    assert store.get("a") is None  # evicted from the spill tier
+    assert store.get("e") == b"e" * 90
+    stats = store.stats()
+    assert stats["evictions"] >= 1
+    assert stats["spilled_bytes"] <= store.spill_budget
+    assert stats["memory_bytes"] <= store.memory_budget
+
+
+def test_discard_and_clear_release_both_tiers(store):
+    store.put("a", b"a" * 60)
+    store.put("b", b"b" * 60)
+    paths = spilled_paths(store)
+    store.discard("a")
+    assert store.get("a") is None
+    assert not any(os.path.exists(path) for path in paths)
+    assert (store.stats()["memory_bytes"], store.stats()["spilled_bytes"]) == (60, 0)
+
+    store.put("c", b"c" * 60)
+    store.clear()
+    stats = store.stats()
+    assert (stats["memory_bytes"], stats["spilled_bytes"], stats["memory_items"], stats["spilled_items"]) == (0, 0, 0, 0)
+
+
+def test_decoded_json_counts_against_the_budget(monkeypatch):
+    monkeypatch.setattr(session_store, "DECODED_JSON_SIZE_FACTOR", 4)
+    store = SessionArtifactStore("decoded", memory_budget=1000, spill_budget=10000)
+    store.put_json("results", {"v": "x" * 40})
+    encoded = len(json.dumps({"v": "x" * 40}))
+
+    first = store.get_json("results")
+    assert store.get_json("results") is first
+    assert store.stats()["memory_bytes"] == encoded * 5
+    assert store.stats()["decoded_bytes"] == encoded * 4
+
+    # Replacing or spilling the artifact releases the decoded value too
+    store.put_json("results", {"v": 1})
+    assert store.stats()["decoded_bytes"] == 0
+    store.get_json("results")
+    store.put("filler", b"f" * 1000)
+    assert store.stats()["decoded_bytes"] == 0
+    assert store.stats()["memory_bytes"] <= store.memory_budget
+    store.clear()
+
+
+def test_decoded_values_that_cannot_fit_are_not_kept(monkeypatch):
+    monkeypatch.setattr(session_store, "DECODED_JSON_SIZE_FACTOR", 4)
+    store = SessionArtifactStore("too-big", memory_budget=100, spill_budget=1000)
+    store.put_json("results", list(range(10)))  # 31 bytes encoded, ~155 with the decoded estimate
+    assert store.get_json("results") == list(range(10))
+    assert store.stats()["decoded_bytes"] == 0
+    assert store.get_json("results") is not store.get_json("results")
+    store.clear()
+
+
+def test_process_summary_and_redacted_ids(store):
+    store.put("a", b"a" * 10)
+    assert process_memory_summary()["memory_bytes"] >= 10
+    labels = [s["session_id"] for s in redacted_session_stats("test-session")]
+    assert "this session" in labels and "test-session" not in labels
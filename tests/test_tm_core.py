@@ -0,0 +1,316 @@
+import asyncio
+import json
+from io import BytesIO, StringIO
+
+import pandas as pd
+import pytest
+from PIL import Image
+from tenacity import wait_none
+
+import tm_core
+from tm_core import (
+    CC_PROBABILITY_COLUMN,
+    SimilarMarksStreamDecoder,
+    aggregate_design_codes,
+    aggregate_word_mark_batch,
+    build_cooccurrence_matrix,
+    build_description_search_request,
+    build_design_code_frame,
+    build_image_search_request,
+    build_word_mark_request_body,
+    cached_search_result,
+    crop_image_bytes,
+    filter_coordinated_classes,
+    filter_marks_by_design_code_selection,
+    image_search_cache_key,
+    image_to_png_bytes,
+    load_word_mark_batch_csv,
+    make_preview,
+    map_box_to_original,
+    search_by_image,
+)
+
+
+def test_map_box_scales_preview_box_onto_original():
+    box = {"left": 10, "top": 20, "width": 100, "height": 50}
+    assert map_box_to_original(box, (500, 250), (2000, 1000)) == (40, 80, 440, 280)
+
+
+def test_map_box_clamps_to_original_bounds():
+    box = {"left": -5, "top": -5, "width": 600, "height": 300}
+    assert map_box_to_original(box, (500, 250), (2000, 1000)) == (0, 0, 2000, 1000)
+
+
+def test_map_box_never_returns_an_empty_crop():
+    box = {"left": 10, "top": 10, "width": 0, "height": 0}
+    left, top, right, bottom = map_box_to_original(box, (500, 250), (2000, 1000))
+    assert right > left and bottom > top
+
+
+def test_preview_is_bounded_and_reports_original_size():
+    buffer = BytesIO()
+    Image.new("RGB", (3000, 1500), "white").save(buffer, format="JPEG")
+    preview, original_size = make_preview(buffer.getvalue(), max_side=600)
+    assert original_size == (3000, 1500)
+    assert max(preview.size) <= 600
+
+
+def test_crop_of_cmyk_upload_encodes_as_png():
+    buffer = BytesIO()
+    Image.new("CMYK", (400, 200)).save(buffer, format="JPEG")
+    crop = crop_image_bytes(buffer.getvalue(), (10, 10, 110, 60))
+    assert Image.open(BytesIO(image_to_png_bytes(crop))).size == (100, 50)
+
+
+def feed_in_chunks(decoder, body, size):
+    batches = []
+    for i in range(0, len(body), size):
+        batches.append(decoder.feed(body[i:i + size]))
+    return batches
+
+
+def test_decoder_yields_each_mark_once_across_any_chunking():
+    marks = [{"serial_no": i, "mark_id_char": "CAFÉ ☕", "design_codes": ["01.01.01"]} for i in range(25)]
+    body = json.dumps({"query": {"k": [1, 2]}, "similar_marks": marks, "total": 25}, ensure_ascii=False).encode("utf-8")
+    for size in (1, 7, 64, len(body)):
+        decoder = SimilarMarksStreamDecoder()
+        batches = feed_in_chunks(decoder, body, size)
+        assert [mark for batch in batches for mark in batch] == marks
+
+
+def test_decoder_streams_marks_before_the_body_is_complete():
+    decoder = SimilarMarksStreamDecoder()
+    assert decoder.feed(b'{"similar_marks": [{"serial_no": 1}, {"serial_no"') == [{"serial_no": 1}]
+    assert decoder.feed(b': 2}]}') == [{"serial_no": 2}]
+
+
+def test_decoder_handles_missing_or_null_array():
+    decoder = SimilarMarksStreamDecoder()
+    assert decoder.feed(b'{"similar_marks": null}') == []
+    assert decoder.feed(b', "other": [1, 2]}') == []
+
+    decoder = SimilarMarksStreamDecoder()
+    assert decoder.feed(b'{"error": "none found"}') == []
+
+
+def test_decoder_top_level_array():
+    body = b' [1, {"a": "]"}, 3, -2.5e3, true]'
+    for size in (1, 4, len(body)):
+        decoder = SimilarMarksStreamDecoder(array_key=None)
+        batches = feed_in_chunks(decoder, body, size)
+        assert [item for batch in batches for item in batch] == json.loads(body)
+
+
+def test_decoder_waits_for_numbers_split_across_chunks():
+    decoder = SimilarMarksStreamDecoder(array_key=None)
+    assert decoder.feed(b'[1, 2') == [1]
+    assert decoder.feed(b'3, 4') == [23]
+    assert decoder.feed(b'.5e1]') == [45.0]
+
+
+def test_decoder_keeps_only_undecoded_text():
+    decoder = SimilarMarksStreamDecoder()
+    for _ in range(1000):
+        assert decoder.feed(b'{"padding": "' + b"x" * 100 + b'"}, ') == []
+    assert len(decoder._text) < len('"similar_marks"')
+    decoder.feed(b'"similar_marks": [{"serial_no": 1}, {"serial_no": 2')
+    assert decoder._text.lstrip(", ") == '{"serial_no": 2'
+
+
+class FakeResponse:
+    def __init__(self, body):
+        self.status_code = 200
+        self.body = body
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self.body), 5):
+            yield self.body[i:i + 5]
+
+
+def test_post_search_streams_the_requested_array(monkeypatch):
+    body = b'[{"serial_no": 1}, {"serial_no": 2}]'
+    monkeypatch.setattr(tm_core.requests, "post", lambda url, **kwargs: FakeResponse(body))
+    batches = []
+    result = tm_core.post_search("/x", ("a",), use_cache=False, on_marks=batches.append, array_key=None)
+    assert result == json.loads(body)
+    assert [mark for batch in batches for mark in batch] == json.loads(body)
+
+
+def test_post_search_without_on_marks_skips_incremental_decoding(monkeypatch):
+    body = b'{"similar_marks": [{"serial_no": 1}]}'
+    monkeypatch.setattr(tm_core.requests, "post", lambda url, **kwargs: FakeResponse(body))
+    monkeypatch.setattr(tm_core, "SimilarMarksStreamDecoder", None)  # would fail if used
+    assert tm_core.post_search("/x", ("a",), use_cache=False) == json.loads(body)
+
+
+def test_image_search_is_cached_under_its_reference_key(monkeypatch):
+    stored = {}
+    monkeypatch.setattr(tm_core, "cache_get", lambda namespace, key: stored.get((namespace, key)))
+    monkeypatch.setattr(tm_core, "cache_set", lambda namespace, key, value: stored.update({(namespace, key): value}))
+    key = image_search_cache_key(b"png", "shape_similarity")
+    assert cached_search_result(key) is None
+
+    stored[("search", key)] = b'{"similar_marks": [{"serial_no": 1}]}'
+    assert search_by_image(b"png", "shape_similarity") == cached_search_result(key) == {"similar_marks": [{"serial_no": 1}]}
+    assert cached_search_result(image_search_cache_key(b"png", "concept_similarity")) is None
+
+
+def test_design_code_frame_splits_codes_with_or_without_separators():
+    marks = [{"design_codes": ["01.01.03", "010103"]}, {"design_codes": ["26.03.01", "26.03.01"]}]
+    frame = build_design_code_frame(marks)
+    rows = sorted(frame[["mark_idx", "code", "category", "division"]].itertuples(index=False, name=None))
+    assert rows == [(0, "01.01.03", "01", "01.01"), (0, "010103", "01", "01.01"), (1, "26.03.01", "26", "26.03")]
+
+
+def test_marks_without_design_codes_give_an_empty_frame():
+    frame = build_design_code_frame([{"design_codes": None}, {"design_codes": []}, {}])
+    assert frame.empty
+    assert all(counts.empty for counts in aggregate_design_codes(frame).values())
+    assert filter_marks_by_design_code_selection([{}, {}, {}], frame, ["01"]) == []
+    assert build_design_code_frame([]).empty
+
+
+def test_design_code_counts_are_distinct_marks_per_level():
+    marks = [{"design_codes": ["01.01.03", "01.01.05"]}, {"design_codes": ["01.03.01"]}, {"design_codes": ["26.01.01"]}]
+    counts = aggregate_design_codes(build_design_code_frame(marks))
+    assert counts["category"].to_dict() == {"01": 2, "26": 1}
+    assert counts["division"].to_dict() == {"01.01": 1, "01.03": 1, "26.01": 1}
+    assert counts["code"]["01.01.03"] == 1
+
+
+def test_design_code_selection_matches_category_division_and_code_on_one_code():
+    marks = [{"design_codes": ["01.01.01", "26.03.01"]}, {"design_codes": ["26.03.01"]}, {"design_codes": None}]
+    frame = build_design_code_frame(marks)
+    assert filter_marks_by_design_code_selection(marks, frame, ["01", "26"]) == marks[:2]
+    assert filter_marks_by_design_code_selection(marks, frame, ["26"], ["26.03"]) == marks[:2]
+    assert filter_marks_by_design_code_selection(marks, frame, ["01"], codes=["01.01.01"]) == marks[:1]
+    # Mark 0 has a 01.01 division and a 26.03.01 code, but not on the same design code
+    assert filter_marks_by_design_code_selection(marks, frame, ["01", "26"], ["01.01"], ["26.03.01"]) == []
+
+
+def test_batch_csv_normalizes_columns_and_dedupes_queries():
+    csv = StringIO(" Word_Mark ,GS_Description\nGOOGLE,search\n GOOGLE , search \n,empty\nNIKE,shoes\n")
+    df = load_word_mark_batch_csv(csv)
+    assert df.to_dict("records") == [
+        {"word_mark": "GOOGLE", "gs_description": "search", "nice_class": ""},
+        {"word_mark": "NIKE", "gs_description": "shoes", "nice_class": ""},
+    ]
+
+
+def test_batch_csv_reports_missing_columns():
+    with pytest.raises(ValueError, match="gs_description"):
+        load_word_mark_batch_csv(StringIO("word_mark,nice_class\nGOOGLE,9\n"))
+
+
+class FakeAsyncResponse:
+    def __init__(self, status, body=b"[]"):
+        self.status = status
+        self.body = body
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def read(self):
+        return self.body
+
+    async def text(self):
+        return self.body.decode()
+
+
+class FakeAsyncSession:
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.calls = 0
+
+    def post(self, url, **kwargs):
+        self.calls += 1
+        return FakeAsyncResponse(self.statuses.pop(0), b'[{"serial_no": 1}]')
+
+
+def fetch(session):
+    return asyncio.run(tm_core.fetch_word_mark_candidates_async(session, asyncio.Semaphore(1), {"q": "x"}))
+
+
+def test_batch_fetch_retries_429_and_5xx(monkeypatch):
+    monkeypatch.setattr(tm_core, "wait_exponential", lambda **kwargs: wait_none())
+    monkeypatch.setattr(tm_core, "WORD_MARK_BATCH_RETRIES", 3)
+    session = FakeAsyncSession([429, 503, 500, 200])
+    assert fetch(session) == [{"serial_no": 1}]
+    assert session.calls == 4  # the first attempt plus three retries
+
+    session = FakeAsyncSession([502] * 5)
+    with pytest.raises(tm_core.RetryableStatusError):
+        fetch(session)
+    assert session.calls == 4
+
+
+def test_batch_fetch_does_not_retry_client_errors(monkeypatch):
+    monkeypatch.setattr(tm_core, "wait_exponential", lambda **kwargs: wait_none())
+    session = FakeAsyncSession([400, 200])
+    with pytest.raises(ValueError, match="400"):
+        fetch(session)
+    assert session.calls == 1
+
+
+def test_batch_results_are_ranked_within_each_query():
+    queries = pd.DataFrame([
+        {"word_mark": "A", "gs_description": "a", "nice_class": ""},
+        {"word_mark": "B", "gs_description": "b", "nice_class": "9"},
+        {"word_mark": "C", "gs_description": "c", "nice_class": ""},
+    ])
+    outcomes = {
+        0: ([{"serial_no": 1, "word_similarity_score": 0.5, "good_services_similarity_score": 0.1},
+             {"serial_no": 2, "word_similarity_score": 0.9, "good_services_similarity_score": 0.1},
+             {"serial_no": 3, "word_similarity_score": 0.5, "good_services_similarity_score": 0.7}], None),
+        1: ([{"serial_no": 4, "word_similarity_score": 0.2, "good_services_similarity_score": 0.2}], None),
+        2: (None, "Error 500"),
+    }
+    df = aggregate_word_mark_batch(queries, outcomes)
+    assert list(zip(df["query_word_mark"], df["rank"], df["serial_no"])) == [("A", 1, 2), ("A", 2, 3), ("A", 3, 1), ("B", 1, 4)]
+    assert list(df.columns[:4]) == ["query_word_mark", "query_gs_description", "query_nice_class", "rank"]
+    assert aggregate_word_mark_batch(queries, {}).empty
+
+
+def test_request_builders_only_send_optional_fields_when_given():
+    assert build_description_search_request("  a chef ", "  ") == {"description": "a chef"}
+    assert build_description_search_request("a chef", " food ") == {"description": "a chef", "gs_desc": "food"}
+    assert build_word_mark_request_body(" GOOGLE ", "search", "") == {"word_mark": "GOOGLE", "gs_description": "search"}
+    assert build_word_mark_request_body("GOOGLE", "search", 9)["nice_class"] == "9"
+
+    files, data = build_image_search_request(b"png", "shape_similarity")
+    assert data == {"similarity_type": "shape_similarity"}
+    name, stream, content_type = files["image"]
+    assert (name, stream.read(), content_type) == ("cropped_image.png", b"png", "image/png")
+
+
+def cc_frame():
+    return pd.DataFrame({
+        "Class A": ["10 (medical)", "10 (medical)", "9 (software)", "9 (software)", "10 (medical)"],
+        "Class B": ["9 (software)", "35 (advertising)", "10 (medical)", "35 (advertising)", "5 (pharma)"],
+        CC_PROBABILITY_COLUMN: [30.126, 20.0, 12.5, 55.0, 20.5],
+    })
+
+
+def test_cooccurrence_matrix_is_sorted_numerically():
+    matrix = build_cooccurrence_matrix(cc_frame())
+    assert list(matrix.index) == ["9 (software)", "10 (medical)"]
+    assert list(matrix.columns) == ["5 (pharma)", "9 (software)", "10 (medical)", "35 (advertising)"]
+    assert matrix.at["9 (software)", "35 (advertising)"] == 55.0
+    assert pd.isna(matrix.at["9 (software)", "5 (pharma)"])
+
+
+def test_coordinated_classes_above_threshold_ranked_from_one():
+    display_df = filter_coordinated_classes(cc_frame(), "10 (medical)", 20)
+    assert list(display_df.columns) == ["Class B", "Probability (%)"]
+    assert list(display_df.index) == [1, 2]
+    assert display_df.to_dict("list") == {"Class B": ["9 (software)", "5 (pharma)"], "Probability (%)": [30.13, 20.5]}
+    assert filter_coordinated_classes(cc_frame(), "10 (medical)", 90).empty
@@ -0,0 +1,98 @@
+import threading
+
+import pytest
+
+import watchlist
+from watchlist import WatchlistStore, compute_delta, run_saved_searches, snapshot_rows
+
+
+def mark(serial_no, score, codes=()):
+    return {"serial_no": serial_no, "similarity_score": score, "design_codes": list(codes)}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return WatchlistStore(str(tmp_path / "watchlist.sqlite3"))
+
+
+def test_delta_reports_new_changed_and_removed_marks():
+    previous = snapshot_rows("image", [mark(1, 0.9, ["01.01.01"]), mark(2, 0.8), mark(3, 0.7)])
+    current = [mark(4, 0.95), mark(1, 0.9, ["01.01.01", "26.01.01"]), mark(2, 0.6), mark(3, 0.705)]
+
+    delta = compute_delta(previous, current, "image", score_tolerance=0.01)
+    assert delta["new"] == [mark(4, 0.95)]
+    assert [(m["serial_no"], m["previous_score"]) for m in delta["changed"]] == [(1, 0.9), (2, 0.8)]
+    assert delta["removed"] == []
+
+    delta = compute_delta(previous, [mark(1, 0.9, ["01.01.01"])], "image")
+    assert delta == {"new": [], "changed": [], "removed": ["2", "3"]}
+
+
+def test_delta_uses_word_similarity_for_word_marks():
+    previous = snapshot_rows("word_mark", [{"serial_no": 1, "word_similarity_score": 0.5, "similarity_score": 0.1}])
+    current = [{"serial_no": 1, "word_similarity_score": 0.5, "similarity_score": 0.9}]
+    assert compute_delta(previous, current, "word_mark")["changed"] == []
+
+
+def test_delta_treats_appearing_score_as_change():
+    previous = snapshot_rows("image", [{"serial_no": 1}])
+    assert len(compute_delta(previous, [mark(1, 0.5)], "image")["changed"]) == 1
+
+
+def test_saved_search_round_trip_and_cascade(store):
+    store.add_saved_search("chef", "description", {"description": "chef", "gs_desc": ""}, initial_marks=[mark(1, 0.9)])
+    saved = store.get_saved_search("chef")
+    assert saved["params"] == {"description": "chef", "gs_desc": ""}
+    assert store.load_snapshot(saved["id"]) == {"1": (0.9, ())}
+    assert store.due_saved_searches() == []
+
+    store.delete_saved_search("chef")
+    assert store.get_saved_search("chef") is None
+    assert store.load_snapshot(saved["id"]) == {}
+
+
+def test_unknown_kind_is_rejected(store):
+    with pytest.raises(ValueError):
+        store.add_saved_search("x", "sound_mark", {})
+
+
+def test_never_run_and_overdue_searches_are_due(store):
+    store.add_saved_search("fresh", "description", {"description": "a"}, initial_marks=[])
+    store.add_saved_search("never", "description", {"description": "b"})
+    assert store.due_saved_searches() == ["never"]
+    fresh = store.get_saved_search("fresh")
+    assert store.due_saved_searches(now=fresh["last_run_at"] + 7 * 86400) == ["fresh", "never"]
+
+
+def test_run_updates_snapshots_and_captures_errors(store, monkeypatch):
+    store.add_saved_search("ok", "description", {"description": "a"}, initial_marks=[mark(1, 0.9), mark(2, 0.8)])
+    store.add_saved_search("broken", "description", {"description": "b"}, initial_marks=[mark(1, 0.9)])
+
+    def execute(saved, cancel_event=None):
+        if saved["name"] == "broken":
+            raise RuntimeError("service down")
+        return [mark(1, 0.9), mark(3, 0.7)]
+
+    monkeypatch.setattr(watchlist, "execute_saved_search", execute)
+    reported = []
+    outcomes = run_saved_searches(store, ["ok", "broken", "missing"], on_outcome=reported.append)
+
+    assert [o["search"]["name"] for o in outcomes] == ["ok", "broken"]
+    assert sorted(o["search"]["name"] for o in reported) == ["broken", "ok"]
+    ok, broken = outcomes
+    assert ok["delta"] == {"new": [mark(3, 0.7)], "changed": [], "removed": ["2"]} and ok["total"] == 2
+    assert broken["delta"] is None and broken["error"] == "service down"
+
+    # The failed search keeps its old snapshot; the next run of the good one has nothing new
+    assert store.load_snapshot(store.get_saved_search("broken")["id"]) == {"1": (0.9, ())}
+    assert run_saved_searches(store, ["ok"])[0]["delta"] == {"new": [], "changed": [], "removed": []}
+
+
+def test_cancelled_run_leaves_unfinished_snapshots_untouched(store, monkeypatch):
+    store.add_saved_search("a", "description", {"description": "a"}, initial_marks=[mark(1, 0.9)])
+    cancel_event = threading.Event()
+    cancel_event.set()
+    monkeypatch.setattr(watchlist, "execute_saved_search", lambda saved, cancel_event=None: [mark(2, 0.5)])
+
+    assert run_saved_searches(store, ["a"], cancel_event=cancel_event) == []
+    assert store.load_snapshot(store.get_saved_search("a")["id"]) == {"1": (0.9, ())}
@@ -0,0 +1,755 @@
+"""Core trademark search, image fetch and report logic shared by the Streamlit app and the CLI.
+
+Nothing in this module touches Streamlit or runs at import time, so it can be
+imported by batch jobs directly.
+"""
+import asyncio
+import codecs
+import json
+import os
+import socket
+import threading
+import weakref
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+import aiohttp
+import boto3
+import pandas as pd
+import requests
+from PIL import Image
+from requests.adapters import HTTPAdapter
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.platypus import Table, TableStyle, Paragraph, Spacer, SimpleDocTemplate, Image as RLImage
+from tenacity import AsyncRetrying, stop_after_attempt, wait_exponential, retry_if_exception_type
+
+from cache_backend import get_cache_backend, make_key
+
+SIMILARITY_SVC_URL = os.getenv("SIMILARITY_SEARCH_SVC")
+IMAGE_DOWNLOAD_SVC_URL = os.getenv("IMAGE_DOWNLOAD_SVC")
+API_KEY = os.getenv("API_KEY")
+CC_ANALYSIS_FILE_PATH = os.getenv("CC_ANALYSIS_FILE_PATH")
+DESIGN_CODE_DESC_PATH = os.getenv("DESIGN_CODE_DESC_PATH")
+
+# AWS credentials
+AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
+AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
+AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
+
+
+# Shared cache helpers; a broken or locked cache must never fail a search
+def cache_get(namespace, key):
+    """Read from the shared cache, treating any cache error as a miss"""
+    try:
+        return get_cache_backend().get(namespace, key)
+    except Exception:
+        return None
+
+
+def cache_set(namespace, key, value):
+    """Write to the shared cache, ignoring cache errors"""
+    try:
+        get_cache_backend().set(namespace, key, value)
+    except Exception:
+        pass
+
+
+# Download CSV from S3 and convert to DataFrame
+def download_csv_from_s3(s3_path):
+    """Download CSV file from S3 (or the shared cache) and return as DataFrame"""
+    if not s3_path:
+        return None
+    
+    cache_key = s3_path
+    cached = cache_get("s3", cache_key)
+    if cached is not None:
+        return pd.read_csv(BytesIO(cached))
+    
+    # Parse S3 path (format: s3://bucket/key)
+    if s3_path.startswith('s3://'):
+        s3_path = s3_path[5:]
+    parts = s3_path.split('/', 1)
+    bucket = parts[0]
+    key = parts[1] if len(parts) > 1 else ''
+    
+    # Create S3 client with credentials if provided, otherwise use default credential chain
+    if AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY:
+        s3_client = boto3.client(
+            's3',
+            aws_access_key_id=AWS_ACCESS_KEY_ID,
+            aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+            region_name=AWS_REGION
+        )
+    else:
+        s3_client = boto3.client('s3', region_name=AWS_REGION)
+    
+    obj = s3_client.get_object(Bucket=bucket, Key=key)
+    content = obj['Body'].read()
+    cache_set("s3", cache_key, content)
+    df = pd.read_csv(BytesIO(content))
+    return df
+
+# Async function to fetch a single image
+async def fetch_image_async(session, image_url, serial_no, headers):
+    """Fetch a single image asynchronously, using the shared thumbnail cache"""
+    try:
+        # The cache is synchronous SQLite (it may wait on a busy lock), so keep it off the event loop
+        thumbnail = await asyncio.to_thread(cache_get, "images", image_url)
+        if thumbnail is None:
+            async with session.get(image_url, timeout=aiohttp.ClientTimeout(total=5), headers=headers) as response:
+                if response.status != 200:
+                    return (serial_no, f"[Error {response.status}]")
+                content = await response.read()
+            
+            # Open image and resize it
+            img = Image.open(BytesIO(content))
+            img.thumbnail((200, 200), Image.Resampling.LANCZOS)  # Resize to max 200x200
+            
+            # Convert resized PIL image to PNG bytes
+            img_buffer = BytesIO()
+            img.save(img_buffer, format='PNG')
+            thumbnail = img_buffer.getvalue()
+            await asyncio.to_thread(cache_set, "images", image_url, thumbnail)
+        
+        # Create RLImage from BytesIO
+        mark_img = RLImage(BytesIO(thumbnail), width=0.8*inch, height=0.8*inch)
+        return (serial_no, mark_img)
+    except asyncio.TimeoutError:
+        return (serial_no, "[Timeout]")
+    except Exception as e:
+        return (serial_no, "[Image unavailable]")
+
+# Async function to fetch all images concurrently
+async def fetch_all_images_async(filtered_marks):
+    """Fetch all images concurrently"""
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+        'Accept': 'image/webp,image/apng,image/svg+xml,image/*,*/*;q=0.8',
+    }
+    
+    async with aiohttp.ClientSession() as session:
+        tasks = []
+        for mark in filtered_marks:
+            serial_no = str(mark.get('serial_no', 'N/A'))
+            image_url = f"{IMAGE_DOWNLOAD_SVC_URL}/{mark.get('serial_no')}/large"
+            tasks.append(fetch_image_async(session, image_url, serial_no, headers))
+        
+        # Execute all tasks concurrently
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        return results
+
+# Function to generate PDF with cropped image and results table
+class ReportError(Exception):
+    """Raised when a PDF report cannot be built"""
+
+
+def generate_pdf_report(cropped_img, filtered_marks, search_type_used, query_text=None):
+    """Generate a PDF report with cropped image (if any) and table of candidates; raises ReportError on failure"""
+    pdf_buffer = BytesIO()
+    
+    try:
+        # Create PDF document
+        doc = SimpleDocTemplate(pdf_buffer, pagesize=letter, topMargin=0.5*inch, bottomMargin=0.5*inch)
+        elements = []
+        styles = getSampleStyleSheet()
+        
+        # Title style
+        title_style = ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=16,
+            textColor=colors.HexColor('#1f78b4'),
+            spaceAfter=12,
+            alignment=TA_CENTER
+        )
+        
+        # Add title
+        title = Paragraph("Trademark/Logo Similarity Search Report", title_style)
+        elements.append(title)
+        elements.append(Spacer(1, 0.2*inch))
+        
+        # Add cropped image - convert PIL to BytesIO
+        if cropped_img is not None:
+            elements.append(Paragraph("<b>Query Image (Cropped):</b>", styles['Heading2']))
+            cropped_buffer = BytesIO()
+            cropped_img.save(cropped_buffer, format='PNG')
+            cropped_buffer.seek(0)
+            img_for_pdf = RLImage(cropped_buffer, width=2*inch, height=2*inch)
+            elements.append(img_for_pdf)
+            elements.append(Spacer(1, 0.3*inch))
+        
+        # Add query text (description searches have no query image)
+        if query_text:
+            elements.append(Paragraph(f"<b>Query:</b> {escape(query_text)}", styles['Normal']))
+            elements.append(Spacer(1, 0.3*inch))
+        
+        # Add results section
+        if filtered_marks:
+            elements.append(Paragraph(f"<b>Found {len(filtered_marks)} Similar Marks:</b>", styles['Heading2']))
+            elements.append(Spacer(1, 0.2*inch))
+            
+            # Create table data
+            table_data = [['Serial No.', 'Trademark Image']]
+            
+            # Fetch all images concurrently using async
+            image_results = asyncio.run(fetch_all_images_async(filtered_marks))
+            
+            # Process results and add to table
+            for serial_no, mark_img in image_results:
+                table_data.append([serial_no, mark_img])
+            
+            # Create table
+            table = Table(table_data, colWidths=[1.5*inch, 3*inch])
+            table.setStyle(TableStyle([
+                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1f78b4')),
+                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                ('FONTSIZE', (0, 0), (-1, 0), 10),
+                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+                ('GRID', (0, 0), (-1, -1), 1, colors.black),
+                ('ROWHEIGHTS', (0, 0), (-1, -1), 1*inch),
+                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ]))
+            
+            elements.append(table)
+        else:
+            elements.append(Paragraph("No results to display.", styles['Normal']))
+        
+        # Build PDF
+        doc.build(elements)
+        pdf_buffer.seek(0)
+        return pdf_buffer
+        
+    except Exception as e:
+        raise ReportError(f"Could not generate the PDF report: {e}") from e
+
+
+# Word mark batch search settings
+WORD_MARK_BATCH_CONCURRENCY = int(os.getenv("WORD_MARK_BATCH_CONCURRENCY", "4"))
+# Retries after the first attempt, so a query is tried at most WORD_MARK_BATCH_RETRIES + 1 times
+WORD_MARK_BATCH_RETRIES = int(os.getenv("WORD_MARK_BATCH_RETRIES", "3"))
+
+
+class RetryableStatusError(Exception):
+    """Raised for upstream responses worth retrying (429 / 5xx)"""
+
+
+def build_word_mark_request_body(word_mark, gs_description, nice_class=""):
+    """Build the locCandidatesForWordMark request body, including nice_class only if provided"""
+    body = {
+        "word_mark": str(word_mark).strip(),
+        "gs_description": str(gs_description).strip()
+    }
+    if nice_class and str(nice_class).strip():
+        body["nice_class"] = str(nice_class).strip()
+    return body
+
+
+def load_word_mark_batch_csv(csv_file):
+    """Read a batch CSV into a DataFrame of unique (word_mark, gs_description, nice_class) queries"""
+    df = pd.read_csv(csv_file, dtype=str).fillna("")
+    df.columns = [str(col).strip().lower() for col in df.columns]
+    missing = {"word_mark", "gs_description"} - set(df.columns)
+    if missing:
+        raise ValueError(f"Missing required column(s): {', '.join(sorted(missing))}")
+    if "nice_class" not in df.columns:
+        df["nice_class"] = ""
+    
+    df = df[["word_mark", "gs_description", "nice_class"]].apply(lambda col: col.str.strip())
+    df = df[(df["word_mark"] != "") & (df["gs_description"] != "")]
+    return df.drop_duplicates().reset_index(drop=True)
+
+
+# Async function to fetch word mark candidates with retry
+async def fetch_word_mark_candidates_async(session, semaphore, body):
+    """Call locCandidatesForWordMark, retrying transient failures with exponential backoff"""
+    endpoint = "/wmark-app/locCandidatesForWordMark"
+    cache_key = make_key(endpoint, json.dumps(body, sort_keys=True))
+    cached = await asyncio.to_thread(cache_get, "search", cache_key)
+    if cached is not None:
+        return json.loads(cached)
+    
+    async with semaphore:
+        async for attempt in AsyncRetrying(
+            stop=stop_after_attempt(WORD_MARK_BATCH_RETRIES + 1),
+            wait=wait_exponential(multiplier=0.5, max=8),
+            retry=retry_if_exception_type((aiohttp.ClientError, asyncio.TimeoutError, RetryableStatusError)),
+            reraise=True
+        ):
+            with attempt:
+                async with session.post(
+                    f"{SIMILARITY_SVC_URL}{endpoint}",
+                    json=body,
+                    timeout=aiohttp.ClientTimeout(total=60)
+                ) as response:
+                    if response.status == 429 or response.status >= 500:
+                        raise RetryableStatusError(f"Error {response.status}")
+                    if response.status != 200:
+                        raise ValueError(f"Error {response.status} - {await response.text()}")
+                    content = await response.read()
+                    await asyncio.to_thread(cache_set, "search", cache_key, content)
+                    return json.loads(content)
+
+
+# Async function to run all batch queries with a concurrency cap
+async def run_word_mark_batch_async(queries_df, on_row_done=None):
+    """Run every query row concurrently; returns {row index: (results, error)}"""
+    semaphore = asyncio.Semaphore(WORD_MARK_BATCH_CONCURRENCY)
+    outcomes = {}
+    
+    async with aiohttp.ClientSession() as session:
+        async def run_row(idx, row):
+            body = build_word_mark_request_body(row["word_mark"], row["gs_description"], row["nice_class"])
+            try:
+                return idx, await fetch_word_mark_candidates_async(session, semaphore, body), None
+            except Exception as e:
+                return idx, None, str(e)
+        
+        tasks = [run_row(idx, row) for idx, row in queries_df.iterrows()]
+        for next_done in asyncio.as_completed(tasks):
+            idx, results, error = await next_done
+            outcomes[idx] = (results, error)
+            if on_row_done:
+                on_row_done(idx, results, error)
+    
+    return outcomes
+
+
+def aggregate_word_mark_batch(queries_df, outcomes):
+    """Combine per-query results into one table ranked within each query"""
+    frames = []
+    for idx, row in queries_df.iterrows():
+        results, _ = outcomes.get(idx, (None, None))
+        if not results:
+            continue
+        df = pd.DataFrame(results).sort_values(
+            by=['word_similarity_score', 'good_services_similarity_score'],
+            ascending=False
+        ).reset_index(drop=True)
+        df.insert(0, 'rank', df.index + 1)
+        df.insert(0, 'query_nice_class', row["nice_class"])
+        df.insert(0, 'query_gs_description', row["gs_description"])
+        df.insert(0, 'query_word_mark', row["word_mark"])
+        frames.append(df)
+    
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+
+class SimilaritySearchError(Exception):
+    """Raised when the similarity service returns a non-200 response"""
+    
+    def __init__(self, status_code, text=""):
+        super().__init__(f"Error: {status_code} - {text}" if text else f"Error: {status_code}")
+        self.status_code = status_code
+        self.text = text
+
+
+def api_headers():
+    """Headers for the similarity service, including the API key if configured"""
+    return {"x-api-key": API_KEY} if API_KEY else {}
+
+
+def build_image_search_request(image_bytes, similarity_type):
+    """Build the multipart files/data for /similarMarksByImage"""
+    files = {"image": ("cropped_image.png", BytesIO(image_bytes), "image/png")}
+    data = {"similarity_type": similarity_type}
+    return files, data
+
+
+def build_description_search_request(description, gs_desc=""):
+    """Build the form data for /similarMarksByDescription, including gs_desc only if provided"""
+    data = {"description": description.strip()}
+    if gs_desc and gs_desc.strip():
+        data["gs_desc"] = gs_desc.strip()
+    return data
+
+
+def image_to_png_bytes(img):
+    """Encode a PIL image as PNG bytes for upload"""
+    if img.mode not in ("1", "L", "LA", "I", "I;16", "P", "RGB", "RGBA"):
+        # e.g. CMYK or YCbCr JPEGs, which PNG cannot store
+        img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+    img_byte_arr = BytesIO()
+    img.save(img_byte_arr, format='PNG')
+    return img_byte_arr.getvalue()
+
+
+# Bytes read per chunk when streaming search responses, and how long to wait for the service
+SEARCH_STREAM_CHUNK_SIZE = int(os.getenv("SEARCH_STREAM_CHUNK_SIZE", "16384"))
+SEARCH_CONNECT_TIMEOUT_SECONDS = float(os.getenv("SEARCH_CONNECT_TIMEOUT_SECONDS", "10"))
+SEARCH_READ_TIMEOUT_SECONDS = float(os.getenv("SEARCH_READ_TIMEOUT_SECONDS", "300"))
+
+# Longest side of the downscaled proxy shown in the cropper and preview column
+PREVIEW_MAX_SIDE = int(os.getenv("PREVIEW_MAX_SIDE", "700"))
+
+
+def make_preview(image_bytes, max_side=PREVIEW_MAX_SIDE):
+    """Decode an upload into a bounded-size preview; returns (preview image, original (width, height))"""
+    img = Image.open(BytesIO(image_bytes))
+    original_size = img.size
+    # Let the JPEG decoder downscale while decoding instead of materializing full resolution
+    img.draft("RGB", (max_side, max_side))
+    preview = img.convert("RGBA") if img.mode in ("P", "LA", "PA") else img.copy()
+    preview.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+    return preview, original_size
+
+
+def map_box_to_original(box, preview_size, original_size):
+    """Map a cropper box {left, top, width, height} on the preview onto original pixels as (left, top, right, bottom)"""
+    scale_x = original_size[0] / preview_size[0]
+    scale_y = original_size[1] / preview_size[1]
+    left = max(0, round(box["left"] * scale_x))
+    top = max(0, round(box["top"] * scale_y))
+    right = min(original_size[0], round((box["left"] + box["width"]) * scale_x))
+    bottom = min(original_size[1], round((box["top"] + box["height"]) * scale_y))
+    return (left, top, max(right, left + 1), max(bottom, top + 1))
+
+
+def crop_image_bytes(image_bytes, crop_box):
+    """Decode the original upload and crop it to (left, top, right, bottom)"""
+    return Image.open(BytesIO(image_bytes)).crop(crop_box)
+
+
+class SearchCancelled(Exception):
+    """Raised when a streaming search is cancelled before the response is complete"""
+
+
+class CancelEvent(threading.Event):
+    """Event that, when set, also aborts the HTTP requests sent through its session
+
+    post_search sends requests through .session, so setting the event from
+    another thread shuts down the request's socket instead of leaving the
+    worker blocked until the upstream answers or the read timeout expires.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._connections = weakref.WeakSet()
+        self._connections_lock = threading.Lock()
+        self.session = requests.Session()
+        adapter = _ConnectionTrackingAdapter(self._track_connection)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def set(self):
+        super().set()
+        with self._connections_lock:
+            connections = list(self._connections)
+        for conn in connections:
+            sock = getattr(conn, "sock", None)
+            if sock is not None:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+        self.session.close()
+
+    def _track_connection(self, conn):
+        with self._connections_lock:
+            self._connections.add(conn)
+
+
+class _ConnectionTrackingAdapter(HTTPAdapter):
+    """HTTPAdapter that reports every connection its pools open"""
+
+    def __init__(self, on_new_connection, **kwargs):
+        self._on_new_connection = on_new_connection
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        on_new_connection = self._on_new_connection
+
+        def tracking_pool(pool_cls):
+            class TrackingPool(pool_cls):
+                def _new_conn(self):
+                    conn = super()._new_conn()
+                    on_new_connection(conn)
+                    return conn
+            return TrackingPool
+
+        self.poolmanager.pool_classes_by_scheme = {
+            scheme: tracking_pool(pool_cls) for scheme, pool_cls in self.poolmanager.pool_classes_by_scheme.items()
+        }
+
+
+class SimilarMarksStreamDecoder:
+    """Incrementally decode the items of a JSON array from a streamed response body
+
+    With array_key the array is the value of that key in the top-level object
+    (e.g. "similar_marks"); without it the top-level value is the array. Each
+    call to feed() returns the items completed by that chunk. Only the text not
+    yet decoded is kept, so feeding a body costs time linear in its length; the
+    caller keeps the body itself if it needs the complete response.
+    """
+    
+    def __init__(self, array_key="similar_marks"):
+        self.array_key = array_key
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._decoder = json.JSONDecoder()
+        self._text = ""
+        self._pos = 0
+        self._state = "seek"  # seek -> items -> done
+    
+    def feed(self, chunk):
+        if self._state == "done":
+            return []
+        self._text += self._utf8.decode(chunk)
+        items = []
+        if self._state == "seek":
+            self._seek_array()
+        while self._state == "items":
+            pos = self._skip(self._pos, " \t\r\n,")
+            if pos >= len(self._text):
+                break
+            if self._text[pos] == "]":
+                self._state = "done"
+                break
+            try:
+                item, end = self._decoder.raw_decode(self._text, pos)
+            except json.JSONDecodeError:
+                break  # Item not complete yet; wait for more data
+            if self._text[pos] not in '{["':
+                follow = self._skip(end, " \t\r\n")
+                if follow >= len(self._text) or self._text[follow] not in ",]":
+                    break  # A number ("1" of "12", "2.5" of "2.5e3") may continue in the next chunk
+            items.append(item)
+            self._pos = end
+        # Drop the text already decoded (or searched for the array)
+        self._text, self._pos = ("", 0) if self._state == "done" else (self._text[self._pos:], 0)
+        return items
+    
+    def _seek_array(self):
+        if self.array_key is None:
+            start = self._skip(0, " \t\r\n")
+            if start < len(self._text) and self._text[start] == "[":
+                self._pos, self._state = start + 1, "items"
+            return
+        key = json.dumps(self.array_key)
+        key_pos = self._text.find(key, self._pos)
+        if key_pos < 0:
+            # Keep only a tail that could still be the start of the key
+            self._pos = max(self._pos, len(self._text) - len(key) + 1)
+            return
+        self._pos = key_pos
+        pos = self._skip(key_pos + len(key), " \t\r\n:")
+        if pos < len(self._text):
+            if self._text[pos] == "[":
+                self._pos, self._state = pos + 1, "items"
+            else:
+                self._state = "done"  # Not an array (e.g. null); nothing to stream
+    
+    def _skip(self, pos, chars):
+        while pos < len(self._text) and self._text[pos] in chars:
+            pos += 1
+        return pos
+
+
+def _response_items(result, array_key):
+    """Items of the response's mark array (the top-level array when array_key is None)"""
+    if array_key is None:
+        return result if isinstance(result, list) else []
+    return (result.get(array_key) or []) if isinstance(result, dict) else []
+
+
+def post_search(endpoint, cache_key_parts, use_cache=True, on_marks=None, cancel_event=None, array_key="similar_marks",
+                **request_kwargs):
+    """POST to the similarity service, serving and storing 200 responses via the shared 'search' cache
+
+    The response is streamed: on_marks (if given) receives each batch of the
+    array at array_key (the top-level array when None) as soon as it is
+    decoded, and setting cancel_event aborts the request with SearchCancelled.
+    A CancelEvent also interrupts a request that is still waiting for the
+    upstream; a plain threading.Event is only checked between chunks.
+    """
+    cache_key = make_key(endpoint, *cache_key_parts)
+    if use_cache:
+        cached = cache_get("search", cache_key)
+        if cached is not None:
+            result = json.loads(cached)
+            items = _response_items(result, array_key)
+            if on_marks and items:
+                on_marks(items)
+            return result
+    
+    def cancelled():
+        return cancel_event is not None and cancel_event.is_set()
+    
+    if cancelled():
+        raise SearchCancelled()
+    http = cancel_event.session if isinstance(cancel_event, CancelEvent) else requests
+    try:
+        with http.post(
+            f"{SIMILARITY_SVC_URL}{endpoint}",
+            stream=True,
+            timeout=(SEARCH_CONNECT_TIMEOUT_SECONDS, SEARCH_READ_TIMEOUT_SECONDS),
+            **request_kwargs
+        ) as response:
+            if response.status_code != 200:
+                raise SimilaritySearchError(response.status_code, response.text)
+            
+            # Without on_marks there is nobody to stream to, so the body is only decoded once at the end
+            decoder = SimilarMarksStreamDecoder(array_key) if on_marks else None
+            content = BytesIO()
+            for chunk in response.iter_content(chunk_size=SEARCH_STREAM_CHUNK_SIZE):
+                if cancelled():
+                    raise SearchCancelled()
+                content.write(chunk)
+                marks = decoder.feed(chunk) if decoder else None
+                if marks:
+                    on_marks(marks)
+    except requests.RequestException:
+        # Shutting the socket down surfaces as a connection error in the worker
+        if cancelled():
+            raise SearchCancelled()
+        raise
+    if cancelled():
+        raise SearchCancelled()
+    
+    body = content.getvalue()
+    result = json.loads(body)
+    cache_set("search", cache_key, body)
+    return result
+
+
+def image_search_cache_key(image_bytes, similarity_type):
+    """Key under which search_by_image stores its response in the shared 'search' cache"""
+    return make_key("/similarMarksByImage", similarity_type, image_bytes)
+
+
+def cached_search_result(cache_key):
+    """Decoded response stored in the shared 'search' cache under cache_key, or None"""
+    cached = cache_get("search", cache_key)
+    return json.loads(cached) if cached is not None else None
+
+
+def search_by_image(image_bytes, similarity_type, use_cache=True, on_marks=None, cancel_event=None):
+    """Search similar marks by image; similarity_type is 'shape_similarity' or 'concept_similarity'"""
+    files, data = build_image_search_request(image_bytes, similarity_type)
+    return post_search(
+        "/similarMarksByImage",
+        (similarity_type, image_bytes),
+        use_cache=use_cache,
+        on_marks=on_marks,
+        cancel_event=cancel_event,
+        files=files,
+        data=data,
+        headers=api_headers()
+    )
+
+
+def search_by_description(description, gs_desc="", use_cache=True, on_marks=None, cancel_event=None):
+    """Search similar marks by a text description of the logo"""
+    data = build_description_search_request(description, gs_desc)
+    return post_search(
+        "/similarMarksByDescription",
+        (json.dumps(data, sort_keys=True),),
+        use_cache=use_cache,
+        on_marks=on_marks,
+        cancel_event=cancel_event,
+        data=data,
+        headers=api_headers()
+    )
+
+
+def search_word_mark(word_mark, gs_description, nice_class="", use_cache=True, on_marks=None, cancel_event=None):
+    """Search locCandidatesForWordMark for a single query (the response is a top-level list of marks)"""
+    body = build_word_mark_request_body(word_mark, gs_description, nice_class)
+    return post_search(
+        "/wmark-app/locCandidatesForWordMark",
+        (json.dumps(body, sort_keys=True),),
+        use_cache=use_cache,
+        on_marks=on_marks,
+        cancel_event=cancel_event,
+        array_key=None,
+        json=body
+    )
+
+
+def build_design_code_frame(marks):
+    """One row per (mark, design code) with the code's category ('01') and division ('01.01')
+
+    USPTO design codes are category.division.section (e.g. 01.01.03); codes
+    without separators (e.g. 010103) are split the same way.
+    """
+    codes = pd.Series([mark.get("design_codes") or [] for mark in marks], dtype=object).explode().dropna()
+    frame = pd.DataFrame({"mark_idx": codes.index.astype(int), "code": codes.astype(str).values})
+    digits = frame["code"].str.replace(r"\D", "", regex=True)
+    frame["category"] = digits.str[:2]
+    frame["division"] = digits.str[:2] + "." + digits.str[2:4]
+    return frame.drop_duplicates(["mark_idx", "code"])
+
+
+def aggregate_design_codes(code_frame):
+    """Distinct-mark counts per category, division and code, each sorted by count (descending)"""
+    return {
+        level: code_frame.groupby(level)["mark_idx"].nunique().sort_values(ascending=False, kind="stable")
+        for level in ("category", "division", "code")
+    }
+
+
+def filter_marks_by_design_code_selection(marks, code_frame, categories, divisions=None, codes=None):
+    """Keep marks with a design code in the selected categories, narrowed by divisions/codes if given"""
+    mask = code_frame["category"].isin(categories)
+    if divisions:
+        mask &= code_frame["division"].isin(divisions)
+    if codes:
+        mask &= code_frame["code"].isin(codes)
+    keep = set(code_frame.loc[mask, "mark_idx"])
+    return [mark for idx, mark in enumerate(marks) if idx in keep]
+
+
+def filter_marks_by_design_codes(marks, selected_codes):
+    """Keep marks that carry at least one of the selected design codes"""
+    selected_codes = set(selected_codes)
+    return [
+        mark for mark in marks
+        if selected_codes.intersection(mark.get("design_codes", []) or [])
+    ]
+
+
+# ===== COORDINATE CLASS ANALYSIS =====
+CC_PROBABILITY_COLUMN = 'P(B|A) (probability % that an application will file for class B given it has filed for class A)'
+
+
+def extract_class_number(class_str):
+    """Extract numeric class number from string like '1 (something)'"""
+    try:
+        return int(str(class_str).split()[0])
+    except (ValueError, IndexError):
+        return 0
+
+
+def build_cooccurrence_matrix(cc_df):
+    """Pivot the class co-occurrence data into a Class A x Class B matrix sorted numerically"""
+    heatmap_data = cc_df.pivot(
+        index='Class A',
+        columns='Class B',
+        values=CC_PROBABILITY_COLUMN
+    )
+    sorted_index = sorted(heatmap_data.index, key=extract_class_number)
+    sorted_columns = sorted(heatmap_data.columns, key=extract_class_number)
+    return heatmap_data.reindex(index=sorted_index, columns=sorted_columns)
+
+
+def filter_coordinated_classes(cc_df, class_a, threshold):
+    """Return Class B rows with P(B|A) above threshold for class_a, highest probability first"""
+    filtered_data = cc_df[
+        (cc_df['Class A'] == class_a) &
+        (cc_df[CC_PROBABILITY_COLUMN] > threshold)
+    ].copy()
+    
+    display_df = filtered_data.sort_values(by=CC_PROBABILITY_COLUMN, ascending=False)[['Class B', CC_PROBABILITY_COLUMN]]
+    display_df.columns = ['Class B', 'Probability (%)']
+    display_df['Probability (%)'] = display_df['Probability (%)'].round(2)
+    display_df.reset_index(drop=True, inplace=True)
+    display_df.index = display_df.index + 1  # Start index from 1
+    return display_df
@@ -0,0 +1,263 @@
+"""Saved-search watchlists: re-run logo, description and word-mark searches and report only what changed.
+
+Each saved search keeps a compact snapshot of its last results (serial number,
+score, design codes) in a local SQLite file. Re-running it computes the delta
+(new and changed marks, plus removed serial numbers) against that snapshot;
+thumbnails and PDF reports are produced for the delta only.
+"""
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from io import BytesIO
+
+from PIL import Image
+
+from tm_core import SearchCancelled, generate_pdf_report, search_by_description, search_by_image, search_word_mark
+
+WATCHLIST_DB_PATH = os.getenv("WATCHLIST_DB_PATH", "watchlist.sqlite3")
+WATCHLIST_RUN_CONCURRENCY = int(os.getenv("WATCHLIST_RUN_CONCURRENCY", "4"))
+# Score movements smaller than this are not reported as changes
+WATCHLIST_SCORE_TOLERANCE = float(os.getenv("WATCHLIST_SCORE_TOLERANCE", "0.01"))
+
+SEARCH_KINDS = ("image", "description", "word_mark")
+
+
+class WatchlistStore:
+    """SQLite store of saved searches and their last result snapshots"""
+
+    def __init__(self, path=WATCHLIST_DB_PATH):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS saved_searches (
+                    id INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL UNIQUE,
+                    kind TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    image BLOB,
+                    interval_days REAL NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_run_at REAL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS snapshots (
+                    search_id INTEGER NOT NULL REFERENCES saved_searches (id) ON DELETE CASCADE,
+                    serial_no TEXT NOT NULL,
+                    score REAL,
+                    design_codes TEXT NOT NULL,
+                    PRIMARY KEY (search_id, serial_no)
+                ) WITHOUT ROWID
+            """)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys = ON")
+        return _ClosingTransaction(conn)
+
+    def add_saved_search(self, name, kind, params, image_bytes=None, interval_days=7, initial_marks=None):
+        """Save a search; initial_marks (results the analyst has already seen) become the first snapshot"""
+        if kind not in SEARCH_KINDS:
+            raise ValueError(f"Unknown search kind: {kind}")
+        now = time.time()
+        with self._connect() as conn:
+            search_id = conn.execute(
+                "INSERT INTO saved_searches (name, kind, params, image, interval_days, created_at, last_run_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (name, kind, json.dumps(params), image_bytes, interval_days, now, now if initial_marks is not None else None)
+            ).lastrowid
+            if initial_marks is not None:
+                self._write_snapshot(conn, search_id, snapshot_rows(kind, initial_marks))
+        return search_id
+
+    def list_saved_searches(self):
+        """All saved searches (without image bytes), oldest first"""
+        with self._connect() as conn:
+            rows = conn.execute("""
+                SELECT s.id, s.name, s.kind, s.params, s.interval_days, s.created_at, s.last_run_at,
+                       (SELECT COUNT(*) FROM snapshots WHERE search_id = s.id) AS snapshot_size
+                FROM saved_searches s ORDER BY s.id
+            """).fetchall()
+        return [{**dict(row), "params": json.loads(row["params"])} for row in rows]
+
+    def get_saved_search(self, name):
+        """Saved search by name (including image bytes), or None"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM saved_searches WHERE name = ?", (name,)).fetchone()
+        return {**dict(row), "params": json.loads(row["params"])} if row else None
+
+    def delete_saved_search(self, name):
+        """Remove a saved search and its snapshot"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM saved_searches WHERE name = ?", (name,))
+
+    def due_saved_searches(self, now=None):
+        """Names of searches never run or whose interval has elapsed"""
+        now = time.time() if now is None else now
+        return [
+            s["name"] for s in self.list_saved_searches()
+            if s["last_run_at"] is None or now - s["last_run_at"] >= s["interval_days"] * 86400
+        ]
+
+    def load_snapshot(self, search_id):
+        """{serial_no: (score, design codes tuple)} from the last run"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT serial_no, score, design_codes FROM snapshots WHERE search_id = ?", (search_id,)
+            ).fetchall()
+        return {row["serial_no"]: (row["score"], _split_codes(row["design_codes"])) for row in rows}
+
+    def replace_snapshot(self, search_id, rows, run_at=None):
+        """Replace the snapshot with rows from the latest run"""
+        with self._connect() as conn:
+            self._write_snapshot(conn, search_id, rows)
+            conn.execute(
+                "UPDATE saved_searches SET last_run_at = ? WHERE id = ?",
+                (time.time() if run_at is None else run_at, search_id)
+            )
+
+    def _write_snapshot(self, conn, search_id, rows):
+        conn.execute("DELETE FROM snapshots WHERE search_id = ?", (search_id,))
+        conn.executemany(
+            "INSERT INTO snapshots VALUES (?, ?, ?, ?)",
+            [(search_id, serial_no, score, ",".join(codes)) for serial_no, (score, codes) in rows.items()]
+        )
+
+
+class _ClosingTransaction:
+    """Run a block in one transaction and close the connection afterwards"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type:
+                self.conn.rollback()
+            else:
+                self.conn.commit()
+        finally:
+            self.conn.close()
+        return False
+
+
+def _split_codes(codes):
+    return tuple(codes.split(",")) if codes else ()
+
+
+def mark_score(kind, mark):
+    """Score tracked between runs: word similarity for word marks, similarity score otherwise"""
+    return mark.get("word_similarity_score" if kind == "word_mark" else "similarity_score")
+
+
+def snapshot_rows(kind, marks):
+    """{serial_no: (score, sorted design codes)} for a result set"""
+    return {
+        str(mark.get("serial_no")): (mark_score(kind, mark), tuple(sorted(mark.get("design_codes") or [])))
+        for mark in marks
+    }
+
+
+def compute_delta(previous, current_marks, kind, score_tolerance=WATCHLIST_SCORE_TOLERANCE):
+    """New and changed marks (in result order) plus removed serial numbers, relative to the previous snapshot"""
+    new_marks, changed_marks = [], []
+    current = snapshot_rows(kind, current_marks)
+    for mark in current_marks:
+        serial_no = str(mark.get("serial_no"))
+        if serial_no not in previous:
+            new_marks.append(mark)
+            continue
+        previous_score, previous_codes = previous[serial_no]
+        score, codes = current[serial_no]
+        score_moved = (score is None) != (previous_score is None) or (
+            score is not None and abs(score - previous_score) > score_tolerance
+        )
+        if score_moved or codes != previous_codes:
+            changed_marks.append({**mark, "previous_score": previous_score})
+    removed = sorted(set(previous) - set(current))
+    return {"new": new_marks, "changed": changed_marks, "removed": removed}
+
+
+def execute_saved_search(saved, cancel_event=None):
+    """Run a saved search against the live service (bypassing the shared cache); returns its marks"""
+    params = saved["params"]
+    if saved["kind"] == "image":
+        result = search_by_image(saved["image"], params["similarity_type"], use_cache=False, cancel_event=cancel_event)
+        return result.get("similar_marks", []) or []
+    if saved["kind"] == "description":
+        result = search_by_description(params["description"], params.get("gs_desc", ""), use_cache=False, cancel_event=cancel_event)
+        return result.get("similar_marks", []) or []
+    return search_word_mark(params["word_mark"], params["gs_description"], params.get("nice_class", ""), use_cache=False) or []
+
+
+def run_saved_searches(store, names, concurrency=WATCHLIST_RUN_CONCURRENCY, on_outcome=None, cancel_event=None):
+    """Re-run saved searches concurrently, store new snapshots and return one outcome dict per search
+
+    Each outcome has the saved search, its delta (None on failure), the total
+    number of current marks and any error. on_outcome (if given) receives each
+    outcome as soon as its search finishes. Setting cancel_event stops the
+    searches that have not finished; their snapshots are left untouched and
+    they are left out of the outcomes.
+    """
+    saved_searches = [store.get_saved_search(name) for name in names]
+    saved_searches = [saved for saved in saved_searches if saved is not None]
+
+    def cancelled():
+        return cancel_event is not None and cancel_event.is_set()
+
+    def execute(saved):
+        if cancelled():
+            raise SearchCancelled()
+        return execute_saved_search(saved, cancel_event)
+
+    outcomes = {}
+    executor = ThreadPoolExecutor(max_workers=max(1, concurrency))
+    try:
+        futures = {executor.submit(execute, saved): saved for saved in saved_searches}
+        for future in as_completed(futures):
+            if cancelled():
+                break
+            saved = futures[future]
+            try:
+                marks = future.result()
+            except SearchCancelled:
+                continue
+            except Exception as e:
+                outcome = {"search": saved, "delta": None, "total": 0, "error": str(e)}
+            else:
+                delta = compute_delta(store.load_snapshot(saved["id"]), marks, saved["kind"])
+                store.replace_snapshot(saved["id"], snapshot_rows(saved["kind"], marks))
+                outcome = {"search": saved, "delta": delta, "total": len(marks), "error": None}
+            outcomes[saved["id"]] = outcome
+            if on_outcome:
+                on_outcome(outcome)
+    finally:
+        # Don't wait for searches a cancel is unwinding (or queued ones that will never start)
+        executor.shutdown(wait=not cancelled(), cancel_futures=True)
+    return [outcomes[saved["id"]] for saved in saved_searches if saved["id"] in outcomes]
+
+
+def describe_saved_search(saved):
+    """One-line description of what a saved search queries"""
+    params = saved["params"]
+    if saved["kind"] == "image":
+        return f"Logo image ({params['similarity_type'].replace('_', ' ')})"
+    if saved["kind"] == "description":
+        return f"Description: {params['description']}"
+    return f"Word mark: {params['word_mark']} ({params['gs_description']})"
+
+
+def generate_delta_report(outcome):
+    """PDF of the new and changed marks of one run; thumbnails are fetched for those marks only"""
+    saved, delta = outcome["search"], outcome["delta"]
+    query_img = Image.open(BytesIO(saved["image"])) if saved["kind"] == "image" and saved["image"] else None
+    query_text = (
+        f"{saved['name']} - {describe_saved_search(saved)}. "
+        f"{len(delta['new'])} new, {len(delta['changed'])} changed, {len(delta['removed'])} no longer returned."
+    )
+    return generate_pdf_report(query_img, delta["new"] + delta["changed"], saved["kind"], query_text=query_text)